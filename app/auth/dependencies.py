@@ -1,6 +1,110 @@
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 from fastapi import Request, HTTPException, status, Depends
 from jose import jwt, JWTError
+from pymongo.errors import PyMongoError
 from app.config import settings
+from app.database import db
+
+revoked_tokens_collection = db["revoked_tokens"]
+
+# --- DECODED TOKEN CACHE ---
+# Verifying the JWT signature on every request (HTMX fragments, SSE reconnects)
+# is wasted work for a token we already checked. Decoded users are kept per
+# worker, keyed by a digest of the token, until the token's own `exp` (capped
+# at TOKEN_CACHE_SECONDS). Logout evicts the token and refuses it from then on.
+TOKEN_CACHE_SIZE = 2048
+TOKEN_CACHE_SECONDS = 300
+
+_token_cache = OrderedDict()   # digest -> (user, valid_until)
+_revoked = {}                  # digest -> exp (logged-out tokens still inside their lifetime)
+
+# --- SHARED REVOCATION LIST ---
+# Logout also records the digest in `revoked_tokens` (a TTL index drops it at
+# the token's `exp`). Every worker pulls the entries added since its last look,
+# at most every REVOCATION_CHECK_SECONDS, so a token logged out elsewhere stops
+# authenticating here within that interval instead of living on in the cache.
+# The query reaches REVOCATION_OVERLAP back to catch inserts that committed out
+# of order or came from a worker whose clock runs slightly behind.
+REVOCATION_OVERLAP = timedelta(seconds=30)
+
+_revoked_seen = None           # newest revoked_at pulled from the collection
+_revoked_checked_at = 0.0
+
+def _digest(token: str):
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def _split_bearer(cookie: str):
+    # The cookie value is "Bearer <token>", so we split it
+    scheme, _, param = (cookie or "").partition(" ")
+    return param if scheme.lower() == "bearer" and param else None
+
+def _cached_user(key: str, now: float):
+    entry = _token_cache.get(key)
+    if not entry: return None
+    user, valid_until = entry
+    if valid_until <= now:
+        del _token_cache[key]
+        return None
+    _token_cache.move_to_end(key)
+    return user
+
+def _cache_user(key: str, user: dict, exp, now: float):
+    valid_until = now + TOKEN_CACHE_SECONDS
+    if exp is not None: valid_until = min(valid_until, float(exp))
+    _token_cache[key] = (user, valid_until)
+    _token_cache.move_to_end(key)
+    while len(_token_cache) > TOKEN_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+
+def _mark_revoked(key: str, exp: float, now: float):
+    for stale in [k for k, until in _revoked.items() if until <= now]:
+        del _revoked[stale]
+    _revoked[key] = exp
+    _token_cache.pop(key, None)
+
+async def _sync_revoked(now: float):
+    """Picks up logouts handled by other workers."""
+    global _revoked_seen, _revoked_checked_at
+    mono = time.monotonic()
+    if mono - _revoked_checked_at < settings.REVOCATION_CHECK_SECONDS: return
+    _revoked_checked_at = mono
+    query = {"exp": {"$gt": datetime.fromtimestamp(now, timezone.utc)}}
+    if _revoked_seen is not None: query["revoked_at"] = {"$gt": _revoked_seen - REVOCATION_OVERLAP}
+    try:
+        async for doc in revoked_tokens_collection.find(query):
+            exp, revoked_at = doc["exp"], doc["revoked_at"]
+            # Motor hands back naive UTC datetimes
+            _mark_revoked(doc["_id"], exp.replace(tzinfo=timezone.utc).timestamp(), now)
+            if _revoked_seen is None or revoked_at > _revoked_seen: _revoked_seen = revoked_at
+    except PyMongoError as e:
+        # Keep serving from what we know; the next check retries
+        print(f"Warning: could not read revoked tokens ({e}).")
+
+async def revoke_token(cookie: str):
+    """Logout: drops the token from the cache and rejects it, on every worker, until it expires."""
+    param = _split_bearer(cookie)
+    if not param: return
+    key = _digest(param)
+    _token_cache.pop(key, None)
+    try:
+        exp = jwt.get_unverified_claims(param).get("exp")
+    except JWTError:
+        return
+    now = time.time()
+    exp = float(exp) if exp is not None else now + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    _mark_revoked(key, exp, now)
+    try:
+        await revoked_tokens_collection.update_one(
+            {"_id": key},
+            {"$set": {"exp": datetime.fromtimestamp(exp, timezone.utc), "revoked_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+    except PyMongoError as e:
+        # Still revoked on this worker; the others keep it for up to TOKEN_CACHE_SECONDS
+        print(f"Warning: could not record token revocation ({e}).")
 
 async def get_current_user(request: Request):
     """
@@ -14,12 +118,20 @@ async def get_current_user(request: Request):
         # For HTMX/Templates, returning None allows the route to decide (e.g., redirect to login)
         return None
 
+    param = _split_bearer(token)
+    if not param:
+        return None
+
+    now = time.time()
+    key = _digest(param)
+    await _sync_revoked(now)
+    if key in _revoked:
+        return None
+    user = _cached_user(key, now)
+    if user:
+        return dict(user)
+
     try:
-        # The cookie value is "Bearer <token>", so we split it
-        scheme, _, param = token.partition(" ")
-        if scheme.lower() != "bearer":
-            return None
-            
         payload = jwt.decode(param, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
         role: str = payload.get("role")
@@ -28,7 +140,9 @@ async def get_current_user(request: Request):
         if username is None:
             return None
             
-        return {"sub": username, "role": role, "id": user_id}
+        user = {"sub": username, "role": role, "id": user_id}
+        _cache_user(key, user, payload.get("exp"), now)
+        return dict(user)
         
     except JWTError:
         return None
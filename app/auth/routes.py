@@ -4,7 +4,8 @@ from app.templates import templates
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.database import users_collection
-from app.auth.security import verify_password, create_access_token, get_password_hash
+from app.auth.security import verify_and_update_password, create_access_token, get_password_hash, PasswordHashingBusy
+from app.auth.dependencies import revoke_token
 from app.users.models import UserInDB
 
 router = APIRouter()
@@ -20,12 +21,24 @@ async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends
     # 1. Check User
     user = await users_collection.find_one({"email": form_data.username})
     
-    if not user or not verify_password(form_data.password, user["password_hash"]):
+    try:
+        valid, new_hash = await verify_and_update_password(form_data.password, user["password_hash"]) if user else (False, None)
+    except PasswordHashingBusy:
+        return templates.TemplateResponse("login.html", {
+            "request": request, 
+            "error": "Server busy, try again in a moment"
+        }, status_code=503)
+
+    if not valid:
         return templates.TemplateResponse("login.html", {
             "request": request, 
             "error": "Invalid credentials"
         })
 
+    # Argon2 settings changed since this hash was made: upgrade it while we have the password
+    if new_hash:
+        await users_collection.update_one({"_id": user["_id"]}, {"$set": {"password_hash": new_hash}})
+
     # 2. Create Token
     # We include 'sub' (email), 'role', and 'id' in the token payload
     access_token = create_access_token(data={
@@ -44,7 +57,8 @@ async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends
     return response
 
 @router.get("/logout")
-async def logout():
+async def logout(request: Request):
+    await revoke_token(request.cookies.get("access_token"))
     response = RedirectResponse(url="/auth/login", status_code=status.HTTP_303_SEE_OTHER)
     response.delete_cookie("access_token")
     return response
@@ -74,9 +88,16 @@ async def register(
         })
 
     # 2. Create User
+    try:
+        password_hash = await get_password_hash(password)
+    except PasswordHashingBusy:
+        return templates.TemplateResponse("register.html", {
+            "request": request, "error": "Server busy, try again in a moment"
+        }, status_code=503)
+
     new_user = UserInDB(
         email=email,
-        password_hash=get_password_hash(password),
+        password_hash=password_hash,
         role="PLAYER" # Default role
     )
     
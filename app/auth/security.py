@@ -1,19 +1,49 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import jwt
 from app.config import settings
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# Only the Argon2 costs set in Settings are passed; the rest stay at passlib's defaults
+ARGON2_OPTIONS = {
+    "argon2__rounds": settings.ARGON2_TIME_COST,
+    "argon2__memory_cost": settings.ARGON2_MEMORY_COST,
+    "argon2__parallelism": settings.ARGON2_PARALLELISM,
+}
+pwd_context = CryptContext(schemes=["argon2"], deprecated="auto", **{k: v for k, v in ARGON2_OPTIONS.items() if v is not None})
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# --- PASSWORD HASHING (Off the event loop) ---
+# Argon2 takes tens of milliseconds of CPU and memory by design. It runs in a
+# small thread pool (argon2-cffi releases the GIL) so one login does not stall
+# every other request on the worker. At most PASSWORD_HASH_QUEUE hashes may be
+# running or waiting; past that, callers get PasswordHashingBusy instead of
+# piling up behind a login storm.
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="argon2")
+_hash_slots = asyncio.Semaphore(settings.PASSWORD_HASH_QUEUE)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+class PasswordHashingBusy(Exception):
+    pass
+
+async def _run_hashing(func, *args):
+    if _hash_slots.locked():
+        raise PasswordHashingBusy()
+    async with _hash_slots:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+
+async def verify_password(plain_password, hashed_password):
+    return await _run_hashing(pwd_context.verify, plain_password, hashed_password)
+
+async def verify_and_update_password(plain_password, hashed_password):
+    """Returns (valid, new_hash). new_hash is set when the stored hash uses outdated Argon2 parameters."""
+    return await _run_hashing(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash(password):
+    return await _run_hashing(pwd_context.hash, password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
@@ -0,0 +1,256 @@
+import asyncio
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from app.config import settings
+from app.database import db, characters_collection
+from app.campaigns.models import Encounter
+
+campaigns_collection = db["campaigns"]
+encounters_collection = db["encounters"]
+
+LOG_SIZE = 10
+STREAM_QUEUE_SIZE = 100
+
+# --- ENCOUNTER STORAGE ---
+async def get_encounter_helper(camp: dict):
+    """Active encounter of a campaign. Migrates combat state still embedded in old campaign docs."""
+    enc = await encounters_collection.find_one({"campaign_id": str(camp["_id"]), "active": True})
+    if enc or not (camp.get("combat_active") and camp.get("combatants")):
+        return enc
+
+    legacy = Encounter(campaign_id=str(camp["_id"]), combatants=camp["combatants"], combat_log=camp.get("combat_log", []))
+    enc = legacy.model_dump(by_alias=True, exclude={"id"})
+    try:
+        result = await encounters_collection.insert_one(enc)
+    except DuplicateKeyError:
+        # A concurrent first request migrated it (one active encounter per campaign is a unique index)
+        return await encounters_collection.find_one({"campaign_id": str(camp["_id"]), "active": True})
+    enc["_id"] = result.inserted_id
+    await campaigns_collection.update_one(
+        {"_id": camp["_id"]},
+        {"$set": {"encounter_id": str(enc["_id"])}, "$unset": {"combatants": "", "combat_log": ""}}
+    )
+    return enc
+
+# --- LIVE UPDATES (Pub/Sub for the combat stream) ---
+# Each open /combat/stream connection owns a queue. Commands publish small
+# deltas ({"type": "delta", "combatants": {"3": {"hp_current": 12}}, "log": ...})
+# instead of the client re-rendering the whole dashboard.
+_subscribers = {}
+
+def subscribe(camp_id: str):
+    queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    _subscribers.setdefault(camp_id, set()).add(queue)
+    return queue
+
+def unsubscribe(camp_id: str, queue):
+    subs = _subscribers.get(camp_id)
+    if subs:
+        subs.discard(queue)
+        if not subs: _subscribers.pop(camp_id, None)
+
+def publish(camp_id: str, event: dict):
+    for queue in _subscribers.get(camp_id, ()):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow reader: drop its backlog and tell it to fetch a fresh snapshot
+            while not queue.empty(): queue.get_nowait()
+            queue.put_nowait({"type": "resync"})
+
+def build_delta(set_ops: dict, log_msg=None):
+    """Turns {"combatants.3.hp_current": 12} into {"3": {"hp_current": 12}}."""
+    changed = {}
+    for path, value in set_ops.items():
+        _, idx, field = path.split(".", 2)
+        changed.setdefault(idx, {})[field] = value
+    event = {"type": "delta", "combatants": changed}
+    if log_msg: event["log"] = log_msg
+    return event
+
+# --- LIVE COMBAT SESSIONS ---
+# While a fight is running its encounter is held in process, so commands read
+# nothing from Mongo: they run one at a time under the session lock against the
+# held state. Each command's changes go out as one update filtered on the
+# encounter version before the client is answered. If another worker (or a
+# direct edit) got there first the update matches nothing; the session reloads
+# the stored encounter and the command is refused with EncounterConflict, so an
+# acknowledged action is never dropped. Only the character sheet syncs are
+# written behind, in batches (every COMBAT_FLUSH_SECONDS, on end and on shutdown).
+# A held session is swapped out when the campaign document, which every route
+# reads anyway, says its fight ended or another one started.
+
+class EncounterConflict(Exception):
+    """The encounter was ended, restarted or written outside this session."""
+
+class CombatSession:
+    def __init__(self, encounter: dict):
+        self.encounter = encounter
+        self.lock = asyncio.Lock()
+        self.pending_chars = {}
+
+    @property
+    def combatants(self):
+        return self.encounter["combatants"]
+
+    @property
+    def dirty(self):
+        return bool(self.pending_chars)
+
+    @property
+    def campaign_id(self):
+        return self.encounter["campaign_id"]
+
+    @property
+    def version(self):
+        return self.encounter.get("version", 0)
+
+    def matches(self, camp: dict):
+        """False once the campaign has no fight, or points at another encounter than the one held."""
+        enc_id = str(self.encounter["_id"])
+        return bool(camp.get("combat_active")) and camp.get("encounter_id", enc_id) == enc_id
+
+    def snapshot(self):
+        return {"type": "snapshot", "combatants": self.combatants, "log": self.encounter.get("combat_log", [])}
+
+    async def commit(self, set_ops: dict, log_msg=None):
+        """
+        Writes a command's changed encounter fields (e.g. combatants.3.hp_current)
+        and log line, then streams them. Caller holds the lock. Raises
+        EncounterConflict, with the stored state reloaded, if the write lost.
+        """
+        try:
+            await self._write_encounter(set_ops, [log_msg] if log_msg else [])
+        except EncounterConflict:
+            # The caller may have changed the held state in place; the stored encounter wins
+            if not await self.reload(): forget_session(self)
+            raise
+        except PyMongoError:
+            # Unknown whether it landed; let the next request load the stored state
+            _drop_session(self)
+            publish(self.campaign_id, {"type": "resync"})
+            raise
+
+        if log_msg:
+            log = self.encounter.setdefault("combat_log", [])
+            log.insert(0, log_msg)
+            del log[LOG_SIZE:]
+        publish(self.campaign_id, build_delta(set_ops, log_msg))
+
+    def sync_character(self, char_id: str, fields: dict):
+        """Queues a write to a player's sheet (e.g. status.hp_current)."""
+        self.pending_chars.setdefault(char_id, {}).update(fields)
+
+    async def reload(self):
+        """Re-reads the campaign's active encounter. Returns False if there is none any more."""
+        enc = await encounters_collection.find_one({"campaign_id": self.campaign_id, "active": True})
+        if not enc: return False
+        self.encounter = enc
+        publish(self.campaign_id, {"type": "resync"})
+        return True
+
+    async def flush(self):
+        """Writes the queued sheet syncs out. Caller holds the lock."""
+        if not self.dirty: return
+        chars, self.pending_chars = self.pending_chars, {}
+        try:
+            await characters_collection.bulk_write(
+                [UpdateOne({"_id": ObjectId(cid)}, {"$set": fields}) for cid, fields in chars.items()],
+                ordered=False
+            )
+        except PyMongoError:
+            # Put the batch back (newer values win) so the next flush retries it
+            for cid, fields in self.pending_chars.items():
+                chars.setdefault(cid, {}).update(fields)
+            self.pending_chars = chars
+            raise
+
+    async def _write_encounter(self, set_ops: dict, logs: list):
+        if not (set_ops or logs): return
+        enc_id = self.encounter["_id"]
+
+        update_ops = {"$inc": {"version": 1}}
+        if set_ops: update_ops["$set"] = set_ops
+        if logs: update_ops["$push"] = {"combat_log": {"$each": logs[::-1], "$position": 0, "$slice": LOG_SIZE}}
+
+        result = await encounters_collection.update_one({"_id": enc_id, "version": self.version, "active": True}, update_ops)
+        if result.modified_count != 1: raise EncounterConflict(enc_id)
+        self.encounter["version"] = self.version + 1
+
+_sessions = {}
+_retired = [] # Sessions swapped out with sheet syncs still to write
+_flusher = None
+
+def _drop_session(session: CombatSession):
+    if _sessions.get(session.campaign_id) is session:
+        del _sessions[session.campaign_id]
+        # Sheet syncs from its commands still stand; the flusher writes them and lets go
+        _retired.append(session)
+
+def forget_session(session: CombatSession):
+    if _sessions.get(session.campaign_id) is session:
+        _drop_session(session)
+        publish(session.campaign_id, {"type": "end"})
+
+async def get_session(camp: dict):
+    """The live session for a campaign, (re)loading it from its encounter when needed."""
+    camp_id = str(camp["_id"])
+    session = _sessions.get(camp_id)
+    if session and session.matches(camp): return session
+    if session: _drop_session(session)
+
+    enc = await get_encounter_helper(camp)
+    if not enc: return None
+    return _sessions.setdefault(camp_id, CombatSession(enc))
+
+def open_session(camp_id: str, encounter: dict):
+    session = CombatSession(encounter)
+    _sessions[camp_id] = session
+    publish(camp_id, {"type": "start"})
+    return session
+
+async def close_session(camp_id: str):
+    """Flushes and forgets a campaign's session (end of combat)."""
+    session = _sessions.get(camp_id)
+    if session:
+        _drop_session(session)
+        await _flush_session(session)
+    publish(camp_id, {"type": "end"})
+
+async def _flush_session(session: CombatSession):
+    try:
+        async with session.lock:
+            await session.flush()
+    except PyMongoError as e:
+        print(f"Warning: combat flush failed ({e}). Will retry.")
+    except Exception as e:
+        print(f"Warning: combat flush for campaign {session.campaign_id} failed ({e!r}).")
+    if not session.dirty and session in _retired: _retired.remove(session)
+
+async def flush_all_sessions():
+    for session in _retired[:] + list(_sessions.values()):
+        await _flush_session(session)
+
+async def _flush_loop():
+    while True:
+        await asyncio.sleep(settings.COMBAT_FLUSH_SECONDS)
+        try:
+            await flush_all_sessions()
+        except Exception as e:
+            # Keep writing behind for every other fight
+            print(f"Warning: combat flush loop error ({e!r}).")
+
+async def start_combat_engine():
+    global _flusher
+    if _flusher is None:
+        _flusher = asyncio.create_task(_flush_loop())
+
+async def stop_combat_engine():
+    """Shutdown hook: stops the flusher and writes out every pending change."""
+    global _flusher
+    if _flusher is not None:
+        _flusher.cancel()
+        _flusher = None
+    await flush_all_sessions()
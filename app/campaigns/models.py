@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field, BeforeValidator
-from typing import List, Optional, Annotated
+from typing import List, Optional, Annotated, Any
 from enum import Enum
+from datetime import datetime
 from bson import ObjectId
 
 PyObjectId = Annotated[str, BeforeValidator(str)]
@@ -56,6 +57,12 @@ class MapPin(BaseModel):
     label: str
     type: str = "Party" # Party, Enemy, Location
 
+class CheckRequest(BaseModel):
+    action: str
+    difficulty: int = 3
+    attribute: Optional[str] = None            # Overrides the action's attribute
+    character_ids: Optional[List[str]] = None  # Defaults to the accepted party
+
 class CampaignMember(BaseModel):
     user_id: str
     character_id: str
@@ -82,10 +89,27 @@ class Campaign(BaseModel):
     members: List[CampaignMember] = []
     map_pins: List[MapPin] = []
     
-    # Combat State
+    # Combat State (the fight itself lives in the encounters collection)
     combat_active: bool = False
+    encounter_id: Optional[str] = None # The active fight; lets workers spot a restart without reading encounters
+
+    class Config:
+        populate_by_name = True
+        arbitrary_types_allowed = True
+
+# --- 4. ENCOUNTER (Combat state, one document per fight) ---
+
+class Encounter(BaseModel):
+    id: Optional[PyObjectId] = Field(alias="_id", default=None)
+    campaign_id: str
+    active: bool = True
+
     combatants: List[Combatant] = []
-    combat_log: List[str] = []
+    combat_log: List[Any] = []
+
+    # Optimistic concurrency: every write must match and bump this
+    version: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
 
     class Config:
         populate_by_name = True
@@ -1,51 +1,90 @@
+import asyncio
+import hashlib
+import json
 import random
+from urllib.parse import urlencode
 from fastapi import APIRouter, Depends, Request, Form, status, HTTPException
-from fastapi.responses import RedirectResponse, HTMLResponse
+from fastapi.responses import RedirectResponse, HTMLResponse, JSONResponse, StreamingResponse, Response
 from app.templates import templates
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 
 from app.database import db, users_collection, characters_collection
 from app.auth.dependencies import get_current_user
-from app.campaigns.models import Campaign, CampaignMember, MemberStatus, MapPin, Combatant, EnemyTemplate
-from app.game_rules import DIFFICULTY_LEVELS, calculate_derived_stats, get_game_actions
+from app.core.i18n import get_locale
+from app.core.pagination import keyset_page
+from app.characters.models import CHARACTER_SUMMARY_PROJECTION
+from app.campaigns.models import Campaign, CampaignMember, MemberStatus, MapPin, Combatant, EnemyTemplate, Encounter, CheckRequest
+from app.campaigns.combat import EncounterConflict, encounters_collection, get_session, open_session, close_session, subscribe, unsubscribe
+from app.campaigns.simulator import simulate_encounter
+from app.game_rules import ATTRIBUTES, DIFFICULTY_LEVELS, CHECK_TABLE, MAX_ATTRIBUTE_VALUE, resolve_check, calculate_party_derived_stats, get_game_actions, advance_to_next_turn, predict_turn_order
 
 router = APIRouter()
 campaigns_collection = db["campaigns"]
 bestiary_collection = db["bestiary"]
 
+STREAM_KEEPALIVE_SECONDS = 15
+
+# Fields campaign_list.html reads for each section
+LIST_PROJECTIONS = {
+    "my": {"name": 1, "party_gold": 1, "members.status": 1},
+    "participating": {"name": 1, "party_gold": 1, "members": 1},
+    "available": {"name": 1, "gm_id": 1},
+}
+
 # --- HELPER ---
-async def get_campaign_helper(camp_id: str, user: dict):
+async def empty_page():
+    """Stands in for a listing that does not apply (e.g. a player has no campaigns of their own)."""
+    return [], None
+
+async def get_campaign_helper(camp_id: str, user: dict, projection: dict = None):
     if not ObjectId.is_valid(camp_id): raise HTTPException(404)
-    camp = await campaigns_collection.find_one({"_id": ObjectId(camp_id)})
+    camp = await campaigns_collection.find_one({"_id": ObjectId(camp_id)}, projection)
     if not camp: raise HTTPException(404, "Campaign not found")
     
     is_gm = camp["gm_id"] == user["id"]
     return camp, is_gm
 
 # --- ROUTES ---
+def page_links(cursors: dict, key: str, next_cursor: str):
+    """(first page URL, next page URL) for one paginated section; the other sections keep their place."""
+    others = {k: v for k, v in cursors.items() if v and k != key}
+    first = ("/campaigns?" + urlencode(others) if others else "/campaigns") if cursors.get(key) else None
+    following = f"/campaigns?{urlencode({**others, key: next_cursor})}" if next_cursor else None
+    return first, following
+
 @router.get("/campaigns", response_class=HTMLResponse)
-async def list_campaigns(request: Request, user: dict = Depends(get_current_user)):
+async def list_campaigns(
+    request: Request, mine_after: str = None, joined_after: str = None, after: str = None,
+    user: dict = Depends(get_current_user)
+):
     if not user: return RedirectResponse("/auth/login", status.HTTP_303_SEE_OTHER)
 
-    my_campaigns = []
-    if user["role"] == "GM":
-        my_campaigns = await campaigns_collection.find({"gm_id": user["id"]}).to_list(100)
-    
-    participating_campaigns = await campaigns_collection.find({"members.user_id": user["id"]}).to_list(100)
-    
-    available_campaigns = await campaigns_collection.find({
-        "gm_id": {"$ne": user["id"]},
-        "members.user_id": {"$ne": user["id"]},
-        "status": "Active"
-    }).to_list(100)
-    
-    my_chars = await characters_collection.find({"user_id": ObjectId(user["id"])}).to_list(50)
+    # The list only renders names, gold and member rows; skip combat state, pins and logs.
+    # Each section pages on its own cursor.
+    gm_query = keyset_page(campaigns_collection, {"gm_id": user["id"]}, LIST_PROJECTIONS["my"], mine_after) if user["role"] == "GM" else empty_page()
+    (my_campaigns, mine_next), (participating_campaigns, joined_next), (available_campaigns, available_next), my_chars = await asyncio.gather(
+        gm_query,
+        keyset_page(campaigns_collection, {"members.user_id": user["id"]}, LIST_PROJECTIONS["participating"], joined_after),
+        keyset_page(campaigns_collection, {
+            "gm_id": {"$ne": user["id"]},
+            "members.user_id": {"$ne": user["id"]},
+            "status": "Active"
+        }, LIST_PROJECTIONS["available"], after),
+        characters_collection.find({"user_id": ObjectId(user["id"])}, CHARACTER_SUMMARY_PROJECTION).to_list(50)
+    )
 
+    cursors = {"mine_after": mine_after, "joined_after": joined_after, "after": after}
     return templates.TemplateResponse("campaign_list.html", {
         "request": request, "user": user, 
         "my_campaigns": my_campaigns, 
         "participating_campaigns": participating_campaigns,
         "available_campaigns": available_campaigns,
+        "pages": {
+            "mine": page_links(cursors, "mine_after", mine_next),
+            "joined": page_links(cursors, "joined_after", joined_next),
+            "available": page_links(cursors, "after", available_next),
+        },
         "my_chars": my_chars
     })
 
@@ -62,77 +101,95 @@ async def create_campaign(name: str = Form(...), user: dict = Depends(get_curren
 async def join_campaign(camp_id: str = Form(...), char_id: str = Form(...), user: dict = Depends(get_current_user)):
     if not user: return RedirectResponse("/auth/login", 303)
 
-    char = await characters_collection.find_one({"_id": ObjectId(char_id)})
-    camp = await campaigns_collection.find_one({"_id": ObjectId(camp_id), "members.character_id": char_id})
+    char = await characters_collection.find_one({"_id": ObjectId(char_id)}, CHARACTER_SUMMARY_PROJECTION)
+    camp = await campaigns_collection.find_one({"_id": ObjectId(camp_id), "members.character_id": char_id}, {"_id": 1})
     if camp: return RedirectResponse("/campaigns?error=Already joined", 303)
 
     new_member = CampaignMember(user_id=user["id"], character_id=char_id, character_name=char["name"])
     await campaigns_collection.update_one({"_id": ObjectId(camp_id)}, {"$push": {"members": new_member.model_dump()}})
     return RedirectResponse("/campaigns?msg=Request sent", 303)
 
-# --- GM DASHBOARD (THE SHIELD) ---
-@router.get("/campaigns/{camp_id}/dashboard", response_class=HTMLResponse)
-async def campaign_dashboard(camp_id: str, request: Request, user: dict = Depends(get_current_user)):
-    if not user: return RedirectResponse("/auth/login", 303)
-    camp, is_gm = await get_campaign_helper(camp_id, user)
-    
-    if not is_gm: return RedirectResponse("/campaigns?error=Access Denied", 303)
-
+# --- DASHBOARD SECTIONS (Shared by the full page and the fragment endpoints) ---
+async def load_party(camp: dict):
+    """Accepted party members with derived stats, plus the average party speed."""
     accepted_ids = [ObjectId(m["character_id"]) for m in camp["members"] if m["status"] == "Accepted"]
     party_chars = await characters_collection.find({"_id": {"$in": accepted_ids}}).to_list(100)
     
     total_speed = 0
     processed_party = []
     
-    for char in party_chars:
-        derived = await calculate_derived_stats(char)
+    party_derived = await calculate_party_derived_stats(party_chars)
+    for char, derived in zip(party_chars, party_derived):
         char["derived"] = derived 
         total_speed += derived["current_speed"]
         processed_party.append(char)
         
     avg_speed = int(total_speed / len(party_chars)) if party_chars else 100
+    return processed_party, avg_speed
+
+async def load_bestiary():
+    # The picker only shows name and HP
+    return await bestiary_collection.find({}, {"name": 1, "hp_max": 1}).to_list(100)
+
+async def load_combat(camp: dict):
+    """Puts the live combat state on `camp`, enriched with ammo info (not persisted; for UI only)."""
+    # Combat state lives in its own encounter document
+    session = await get_session(camp) if camp.get("combat_active") else None
+    camp["combat_active"] = session is not None
+    camp["combatants"] = session.combatants if session else []
+    camp["combat_log"] = session.encounter.get("combat_log", []) if session else []
+
+    if not camp["combat_active"]: return
+
+    player_ids = [ObjectId(c["id"]) for c in camp["combatants"] if c.get("type") == "Player"]
+    player_docs = await characters_collection.find({"_id": {"$in": player_ids}}, {"equipment": 1}).to_list(None)
+    equipment_by_id = {str(d["_id"]): d.get("equipment", {}) or {} for d in player_docs}
+
+    enriched = []
+    ranged_types = {"Bow", "Crossbow", "Throwing"}
+    for idx, comb in enumerate(camp["combatants"]):
+        comb_copy = dict(comb)
+        comb_copy["index"] = idx
+        comb_copy["ammo_remaining"] = None
+        comb_copy["is_ranged"] = False
+        if comb.get("type") == "Player" and comb.get("id") in equipment_by_id:
+            equip = equipment_by_id[comb["id"]]
+            # detect ranged weapon
+            weapon_type = None
+            weapon_item = None
+            for slot in ("hand_main", "hand_off"):
+                w = equip.get(slot)
+                if w and w.get("weapon_type") in ranged_types and w.get("category") == "Weapon":
+                    weapon_type = w.get("weapon_type")
+                    weapon_item = w
+                    break
+            if weapon_type in ranged_types:
+                comb_copy["is_ranged"] = True
+                ammo_qty = 0
+                if weapon_type == "Throwing":
+                    if weapon_item:
+                        ammo_qty = max(int(weapon_item.get("quantity", 0)), 0)
+                else:
+                    for slot in ("hand_off", "hand_main"):
+                        itm = equip.get(slot)
+                        if itm and itm.get("category") == "Ammo":
+                            ammo_qty += max(int(itm.get("quantity", 0)), 0)
+                comb_copy["ammo_remaining"] = ammo_qty
+        enriched.append(comb_copy)
+    camp["combatants"] = enriched
 
-    enemies_list = await bestiary_collection.find().to_list(100)
+# --- GM DASHBOARD (THE SHIELD) ---
+@router.get("/campaigns/{camp_id}/dashboard", response_class=HTMLResponse)
+async def campaign_dashboard(camp_id: str, request: Request, user: dict = Depends(get_current_user)):
+    if not user: return RedirectResponse("/auth/login", 303)
+    camp, is_gm = await get_campaign_helper(camp_id, user)
+    
+    if not is_gm: return RedirectResponse("/campaigns?error=Access Denied", 303)
 
+    processed_party, avg_speed = await load_party(camp)
+    enemies_list = await load_bestiary()
     actions = await get_game_actions()
-
-    # Enrich combatants with ammo info (not persisted; for UI only)
-    if camp.get("combat_active"):
-        enriched = []
-        ranged_types = {"Bow", "Crossbow", "Throwing"}
-        for comb in camp.get("combatants", []):
-            comb_copy = dict(comb)
-            comb_copy["ammo_remaining"] = None
-            comb_copy["is_ranged"] = False
-            if comb.get("type") == "Player":
-                char = await characters_collection.find_one({"_id": ObjectId(comb.get("id"))})
-                if char:
-                    equip = char.get("equipment", {}) or {}
-                    # detect ranged weapon
-                    weapon_type = None
-                    weapon_slot = None
-                    weapon_item = None
-                    for slot in ("hand_main", "hand_off"):
-                        w = equip.get(slot)
-                        if w and w.get("weapon_type") in ranged_types and w.get("category") == "Weapon":
-                            weapon_type = w.get("weapon_type")
-                            weapon_slot = slot
-                            weapon_item = w
-                            break
-                    if weapon_type in ranged_types:
-                        comb_copy["is_ranged"] = True
-                        ammo_qty = 0
-                        if weapon_type == "Throwing":
-                            if weapon_item:
-                                ammo_qty = max(int(weapon_item.get("quantity", 0)), 0)
-                        else:
-                            for slot in ("hand_off", "hand_main"):
-                                itm = equip.get(slot)
-                                if itm and itm.get("category") == "Ammo":
-                                    ammo_qty += max(int(itm.get("quantity", 0)), 0)
-                        comb_copy["ammo_remaining"] = ammo_qty
-            enriched.append(comb_copy)
-        camp["combatants"] = enriched
+    await load_combat(camp)
 
     return templates.TemplateResponse("campaign_dashboard.html", {
         "request": request, "user": user, "campaign": camp,
@@ -142,6 +199,93 @@ async def campaign_dashboard(camp_id: str, request: Request, user: dict = Depend
         "bestiary": enemies_list
     })
 
+# --- GM DASHBOARD FRAGMENTS (Partial re-render of one section) ---
+# Each fragment loads only what its partial needs and carries an ETag built from
+# that data, so an unchanged section answers 304 without rendering.
+FRAGMENTS = {
+    "combat": ("partials/campaign_combat.html", {"gm_id": 1, "members": 1, "combat_active": 1, "encounter_id": 1, "combatants": 1, "combat_log": 1}),
+    "party": ("partials/campaign_party.html", {"gm_id": 1, "members": 1}),
+    "bestiary": ("partials/campaign_bestiary.html", {"gm_id": 1}),
+    "map": ("partials/campaign_map_pins.html", {"gm_id": 1, "map_pins": 1}),
+}
+
+def fragment_etag(name: str, context: dict):
+    # The fragment is rendered in the reader's language, so the locale is part of its version
+    payload = json.dumps([name, get_locale(), context], sort_keys=True, default=str)
+    return f'W/"{hashlib.sha1(payload.encode("utf-8")).hexdigest()}"'
+
+@router.get("/campaigns/{camp_id}/fragments/{name}", response_class=HTMLResponse)
+async def campaign_fragment(camp_id: str, name: str, request: Request, user: dict = Depends(get_current_user)):
+    if not user: raise HTTPException(401)
+    if name not in FRAGMENTS: raise HTTPException(404)
+    template_name, projection = FRAGMENTS[name]
+
+    camp, is_gm = await get_campaign_helper(camp_id, user, projection)
+    if not is_gm: raise HTTPException(403)
+
+    context = {"campaign": camp}
+    if name == "party":
+        context["party"], _ = await load_party(camp)
+    elif name == "bestiary":
+        context["bestiary"] = await load_bestiary()
+    elif name == "combat":
+        await load_combat(camp)
+        if not camp["combat_active"]:
+            # Setup mode shows the party and bestiary pickers
+            context["party"], _ = await load_party(camp)
+            context["bestiary"] = await load_bestiary()
+
+    etag = fragment_etag(name, context)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    return templates.TemplateResponse(template_name, {"request": request, "user": user, **context}, headers=headers)
+
+# --- DICE CHECKS ---
+# The odds table is pure and serialized once; the action list is read on every
+# request so GM edits to game_actions show up straight away.
+_check_table_json = None
+
+@router.get("/rules/checks")
+async def check_table(user: dict = Depends(get_current_user)):
+    global _check_table_json
+    if not user: raise HTTPException(401)
+    if _check_table_json is None:
+        _check_table_json = json.dumps({"max_attribute": MAX_ATTRIBUTE_VALUE, "difficulties": CHECK_TABLE})[:-1]
+    payload = f'{_check_table_json}, "actions": {json.dumps(await get_game_actions())}}}'
+    return Response(payload.encode("utf-8"), media_type="application/json", headers={"Cache-Control": "private, no-cache"})
+
+@router.post("/campaigns/{camp_id}/checks/resolve")
+async def resolve_party_check(camp_id: str, check: CheckRequest, user: dict = Depends(get_current_user)):
+    if not user: raise HTTPException(401)
+    camp, is_gm = await get_campaign_helper(camp_id, user, {"gm_id": 1, "members": 1})
+    if not is_gm: raise HTTPException(403)
+
+    attribute = check.attribute
+    if not attribute:
+        action = next((a for a in await get_game_actions() if a["name"] == check.action), None)
+        if not action: raise HTTPException(404, "Unknown action")
+        attribute = action["attribute"]
+    if attribute not in ATTRIBUTES: raise HTTPException(400, "Unknown attribute")
+
+    party_ids = [m["character_id"] for m in camp["members"] if m["status"] == "Accepted"]
+    char_ids = [cid for cid in (check.character_ids or party_ids) if cid in party_ids and ObjectId.is_valid(cid)]
+    chars = await characters_collection.find(
+        {"_id": {"$in": [ObjectId(cid) for cid in char_ids]}},
+        {"name": 1, f"stats.{attribute}.value": 1}
+    ).to_list(None)
+
+    results = []
+    for char in chars:
+        attr_value = char.get("stats", {}).get(attribute, {}).get("value", 0)
+        results.append({
+            "character_id": str(char["_id"]), "name": char["name"], "attribute_value": attr_value,
+            **resolve_check(check.difficulty, attr_value)
+        })
+
+    return JSONResponse({"action": check.action, "attribute": attribute, "difficulty": check.difficulty, "results": results})
+
 # --- GM ACTIONS: Accept/Reject ---
 @router.post("/campaigns/{camp_id}/members/status")
 async def update_member_status(
@@ -227,24 +371,27 @@ async def delete_map_pin(camp_id: str, pin_id: str = Form(...), user: dict = Dep
     await campaigns_collection.update_one({"_id": ObjectId(camp_id)}, {"$pull": {"map_pins": {"id": pin_id}}})
     return RedirectResponse(f"/campaigns/{camp_id}/dashboard", 303)
 
-# --- COMBAT: INITIALIZE ---
-@router.post("/campaigns/{camp_id}/combat/start")
-async def start_combat(
-    camp_id: str,
-    player_ids: list[str] = Form(...), # List of selected players
-    enemy_ids: list[str] = Form(...),  # List of selected enemy templates
-    user: dict = Depends(get_current_user)
-):
-    camp, is_gm = await get_campaign_helper(camp_id, user)
-    if not is_gm: return RedirectResponse("/", 303)
-
+# --- COMBAT: RESPONSES ---
+def combat_response(request: Request, camp_id: str, error: str = None):
+    """303 back to the dashboard, or a small JSON ack for fetch() clients following the live stream."""
+    if "application/json" in request.headers.get("accept", ""):
+        if error: return JSONResponse({"error": error}, status_code=409)
+        return JSONResponse({"ok": True})
+    url = f"/campaigns/{camp_id}/dashboard" + (f"?error={error}" if error else "")
+    return RedirectResponse(url, 303)
+
+# --- COMBAT: ROSTER ---
+async def build_combatants(player_ids: list, enemy_ids: list):
+    """Combatant snapshots for the selected characters and bestiary templates."""
     combatants = []
 
     # 1. Add Players (Snapshot their current stats)
-    for pid in player_ids:
-        char = await characters_collection.find_one({"_id": ObjectId(pid)})
-        derived = await calculate_derived_stats(char) # Get calculated stats
-        
+    players = await characters_collection.find({"_id": {"$in": [ObjectId(pid) for pid in player_ids]}}).to_list(None)
+    players_by_id = {str(p["_id"]): p for p in players}
+    party = [players_by_id[pid] for pid in player_ids if pid in players_by_id]
+    party_derived = await calculate_party_derived_stats(party) # Get calculated stats
+
+    for char, derived in zip(party, party_derived):
         c = Combatant(
             id=str(char["_id"]),
             name=char["name"],
@@ -261,10 +408,14 @@ async def start_combat(
         combatants.append(c)
 
     # 2. Add Enemies (From Bestiary)
+    templates_docs = await bestiary_collection.find({"_id": {"$in": [ObjectId(eid) for eid in set(enemy_ids)]}}).to_list(None)
+    templates_by_id = {str(t["_id"]): t for t in templates_docs}
+
     for eid in enemy_ids:
         # Note: In a real form this might be a list of IDs including duplicates. 
         # For simplicity, we assume the GM selects "Bandit" 3 times if they want 3 bandits.
-        enemy = await bestiary_collection.find_one({"_id": ObjectId(eid)})
+        enemy = templates_by_id.get(eid)
+        if not enemy: continue
         
         # We append a random ID suffix to handle multiple of same type
         unique_id = f"{eid}_{random.randint(1000,9999)}"
@@ -284,64 +435,113 @@ async def start_combat(
         )
         combatants.append(c)
 
-    # Save Initial State
-    await campaigns_collection.update_one(
-        {"_id": ObjectId(camp_id)},
-        {"$set": {
-            "combat_active": True,
-            "combatants": [c.model_dump() for c in combatants],
-            "combat_log": ["Combat Started!"]
-        }}
-    )
+    return combatants
+
+# --- COMBAT: INITIALIZE ---
+@router.post("/campaigns/{camp_id}/combat/start")
+async def start_combat(
+    camp_id: str,
+    player_ids: list[str] = Form(...), # List of selected players
+    enemy_ids: list[str] = Form(...),  # List of selected enemy templates
+    user: dict = Depends(get_current_user)
+):
+    camp, is_gm = await get_campaign_helper(camp_id, user)
+    if not is_gm: return RedirectResponse("/", 303)
+
+    combatants = await build_combatants(player_ids, enemy_ids)
+
+    # Save Initial State (close any previous fight first)
+    await close_session(camp_id)
+    await encounters_collection.update_many({"campaign_id": camp_id, "active": True}, {"$set": {"active": False}})
+    encounter = Encounter(campaign_id=camp_id, combatants=combatants, combat_log=["Combat Started!"]).model_dump(by_alias=True, exclude={"id"})
+    try:
+        result = await encounters_collection.insert_one(encounter)
+    except DuplicateKeyError:
+        # Another start for this campaign won the race
+        return RedirectResponse(f"/campaigns/{camp_id}/dashboard?error=Combat already started", 303)
+    encounter["_id"] = result.inserted_id
+    open_session(camp_id, encounter)
+    await campaigns_collection.update_one({"_id": ObjectId(camp_id)}, {"$set": {"combat_active": True, "encounter_id": str(encounter["_id"])}})
     return RedirectResponse(f"/campaigns/{camp_id}/dashboard", 303)
 
+# --- COMBAT: BALANCE SIMULATOR (Monte Carlo) ---
+@router.post("/campaigns/{camp_id}/combat/simulate")
+async def simulate_combat(
+    camp_id: str,
+    player_ids: list[str] = Form(...),
+    enemy_ids: list[str] = Form(...),
+    fights: int = Form(10000),
+    hit_chance: float = Form(0.75),
+    crit_chance: float = Form(0.05),
+    full_hp: bool = Form(True),
+    user: dict = Depends(get_current_user)
+):
+    if not user: raise HTTPException(401)
+    camp, is_gm = await get_campaign_helper(camp_id, user, {"gm_id": 1})
+    if not is_gm: raise HTTPException(403)
+
+    combatants = [c.model_dump() for c in await build_combatants(player_ids, enemy_ids)]
+    if full_hp:
+        for c in combatants: c["hp_current"] = c["hp_max"]
+
+    fights = max(1, min(fights, 100000))
+    hit_chance = min(max(hit_chance, 0.0), 1.0)
+    crit_chance = min(max(crit_chance, 0.0), hit_chance)
+
+    # NumPy work runs off the event loop
+    report = await asyncio.to_thread(simulate_encounter, combatants, fights, hit_chance, crit_chance)
+    return JSONResponse(report)
+
 # --- COMBAT: NEXT TURN (The Speed Race) ---
 @router.post("/campaigns/{camp_id}/combat/next")
-async def next_turn(camp_id: str, user: dict = Depends(get_current_user)):
+async def next_turn(camp_id: str, request: Request, user: dict = Depends(get_current_user)):
     camp, is_gm = await get_campaign_helper(camp_id, user)
     if not is_gm: return RedirectResponse("/", 303)
     
-    combatants = camp["combatants"]
-    
-    # 1. Check if anyone LIVING is ALREADY ready
-    # We filter for HP > 0 before checking top AP
-    living_combatants = [c for c in combatants if c["hp_current"] > 0]
-    
-    # If everyone is dead, we can't tick (or we just tick normally to let time pass? Let's just return)
-    if not living_combatants:
-        return RedirectResponse(f"/campaigns/{camp_id}/dashboard", 303)
+    session = await get_session(camp)
+    if not session: return combat_response(request, camp_id)
 
-    living_combatants.sort(key=lambda x: x["action_points"], reverse=True)
-    
-    # If the fastest living person is ready, stop ticking.
-    if living_combatants[0]["action_points"] >= 100:
-        return RedirectResponse(f"/campaigns/{camp_id}/dashboard", 303)
+    # Commands for this fight run one at a time
+    async with session.lock:
+        combatants = session.combatants
+        
+        # 1. Check if anyone LIVING is ALREADY ready
+        # We filter for HP > 0 before checking top AP
+        living_combatants = [c for c in combatants if c["hp_current"] > 0]
+        
+        # If everyone is dead, we can't tick (or we just tick normally to let time pass? Let's just return)
+        if not living_combatants:
+            return combat_response(request, camp_id)
+
+        # 2. THE RACE: Jump straight to the tick where the first LIVING person hits 100
+        # (0 ticks if someone is already ready, None if nobody can ever act)
+        ticks = advance_to_next_turn(combatants)
+        if not ticks:
+            return combat_response(request, camp_id)
+        
+        # Save State (only the action bars of the living changed)
+        try:
+            await session.commit({f"combatants.{i}.action_points": c["action_points"] for i, c in enumerate(combatants) if c["hp_current"] > 0})
+        except EncounterConflict:
+            return combat_response(request, camp_id, "Combat changed, try again")
+    return combat_response(request, camp_id)
+
+# --- COMBAT: TURN TIMELINE (For the tracker UI) ---
+@router.get("/campaigns/{camp_id}/combat/timeline")
+async def combat_timeline(camp_id: str, k: int = 10, user: dict = Depends(get_current_user)):
+    if not user: raise HTTPException(401)
+    camp, is_gm = await get_campaign_helper(camp_id, user)
+    if not is_gm: raise HTTPException(403)
 
-    # 2. THE RACE: Loop until a LIVING person hits 100
-    winner_found = False
-    ticks = 0
-    
-    # Safety break after 1000 ticks to prevent infinite loops if speeds are 0
-    while not winner_found and ticks < 1000:
-        ticks += 1
-        for c in combatants:
-            # Only charge AP for the living
-            if c["hp_current"] > 0: 
-                c["action_points"] += c["speed"]
-                if c["action_points"] >= 100:
-                    winner_found = True
-    
-    # Save State
-    await campaigns_collection.update_one(
-        {"_id": ObjectId(camp_id)},
-        {"$set": {"combatants": combatants}}
-    )
-    return RedirectResponse(f"/campaigns/{camp_id}/dashboard", 303)
+    k = max(1, min(k, 100))
+    session = await get_session(camp)
+    return JSONResponse({"turns": predict_turn_order(session.combatants if session else [], k)})
 
 # --- COMBAT: EXECUTE ACTION ---
 @router.post("/campaigns/{camp_id}/combat/act")
 async def combat_action(
     camp_id: str,
+    request: Request,
     actor_index: int = Form(...),
     target_index: int = Form(...),
     action_type: str = Form(...), # "Attack", "Wait", "Miss"
@@ -351,152 +551,184 @@ async def combat_action(
     user: dict = Depends(get_current_user)
 ):
     camp, is_gm = await get_campaign_helper(camp_id, user)
-    combatants = camp["combatants"]
-    log = camp.get("combat_log", [])
+    session = await get_session(camp)
+    if not session: return combat_response(request, camp_id)
+
+    # Commands for this fight run one at a time
+    async with session.lock:
+        combatants = session.combatants
     
-    actor = combatants[actor_index]
-    target = combatants[target_index]
+        actor = combatants[actor_index]
+        target = combatants[target_index]
     
-    if actor["hp_current"] <= 0:
-        return RedirectResponse(f"/campaigns/{camp_id}/dashboard?error=Actor is unconscious!", 303)
-
-    msg = ""
-
-    # 1. Consume Stamina (Rule: 10 per action)
-    stamina_cost = 10
-    if actor["stamina_current"] >= stamina_cost:
-        actor["stamina_current"] -= stamina_cost
-    else:
-        actor["stamina_current"] = 0
-        # (Optional: Add "Exhausted" note to log if needed)
-
-    # 2. Sync Stamina to Sheet (If Player)
-    if actor["type"] == "Player":
-        await characters_collection.update_one(
-            {"_id": ObjectId(actor["id"])},
-            {"$set": {"status.stamina": actor["stamina_current"]}}
-        )
-
-    # 3. Action Logic
-    if action_type == "Wait":
-        actor["action_points"] -= 50
-        msg = f"{actor['name']} waits/hesitates."
-
-    elif action_type == "Miss":
-        actor["action_points"] -= 100
-        msg = f"{actor['name']} attacks {target['name']} but MISSES!"
+        if actor["hp_current"] <= 0:
+            return combat_response(request, camp_id, "Actor is unconscious!")
+
+        msg = ""
+
+        # 1. Action Logic (may bail out on ammo before anything changes)
+        if action_type == "Wait":
+            actor["action_points"] -= 50
+            msg = f"{actor['name']} waits/hesitates."
+
+        elif action_type == "Miss":
+            actor["action_points"] -= 100
+            msg = f"{actor['name']} attacks {target['name']} but MISSES!"
+
+        elif action_type == "Attack":
+            # --- Ammo handling for ranged weapons ---
+            if actor["type"] == "Player":
+                # Fetch latest character state to inspect equipped weapon/ammo
+                actor_char = await characters_collection.find_one({"_id": ObjectId(actor["id"])} )
+                if actor_char:
+                    equip = actor_char.get("equipment", {}) or {}
+                    ranged_types = {"Bow", "Crossbow", "Throwing"}
+
+                    # Identify if the equipped weapon is ranged
+                    weapon_type = None
+                    weapon_slot = None
+                    weapon_item = None
+                    for slot in ("hand_main", "hand_off"):
+                        w = equip.get(slot)
+                        if w and w.get("weapon_type") in ranged_types and w.get("category") == "Weapon":
+                            weapon_type = w.get("weapon_type")
+                            weapon_slot = slot
+                            weapon_item = w
+                            break
 
-    elif action_type == "Attack":
-        # --- Ammo handling for ranged weapons ---
-        if actor["type"] == "Player":
-            # Fetch latest character state to inspect equipped weapon/ammo
-            actor_char = await characters_collection.find_one({"_id": ObjectId(actor["id"])} )
-            if actor_char:
-                equip = actor_char.get("equipment", {}) or {}
-                ranged_types = {"Bow", "Crossbow", "Throwing"}
-
-                # Identify if the equipped weapon is ranged
-                weapon_type = None
-                weapon_slot = None
-                weapon_item = None
-                for slot in ("hand_main", "hand_off"):
-                    w = equip.get(slot)
-                    if w and w.get("weapon_type") in ranged_types and w.get("category") == "Weapon":
-                        weapon_type = w.get("weapon_type")
-                        weapon_slot = slot
-                        weapon_item = w
-                        break
-
-                if weapon_type in ranged_types:
-                    if weapon_type == "Throwing":
-                        # Throwing uses its own quantity on the equipped weapon item
-                        if not weapon_item or weapon_item.get("quantity", 0) <= 0:
-                            return RedirectResponse(f"/campaigns/{camp_id}/dashboard?error=Out%20of%20ammo", 303)
-                        dec_result = await characters_collection.update_one(
-                            {
-                                "_id": ObjectId(actor["id"]),
-                                f"equipment.{weapon_slot}.id": weapon_item.get("id"),
-                                f"equipment.{weapon_slot}.quantity": {"$gt": 0}
-                            },
-                            {"$inc": {f"equipment.{weapon_slot}.quantity": -1}}
-                        )
-                        if dec_result.modified_count == 0:
-                            return RedirectResponse(f"/campaigns/{camp_id}/dashboard?error=Out%20of%20ammo", 303)
-                    else:
-                        # Bows/Crossbows use separate Ammo category items
-                        ammo_slot = None
-                        ammo_item = None
-                        for slot in ("hand_off", "hand_main"):
-                            itm = equip.get(slot)
-                            if itm and itm.get("category") == "Ammo":
-                                ammo_slot = slot
-                                ammo_item = itm
-                                break
-
-                        if not ammo_item or ammo_item.get("quantity", 0) <= 0:
-                            return RedirectResponse(f"/campaigns/{camp_id}/dashboard?error=Out%20of%20ammo", 303)
-
-                        # Decrement ammo quantity in the equipped slot, guard against negatives
-                        dec_result = await characters_collection.update_one(
-                            {
-                                "_id": ObjectId(actor["id"]),
-                                f"equipment.{ammo_slot}.id": ammo_item.get("id"),
-                                f"equipment.{ammo_slot}.quantity": {"$gt": 0}
-                            },
-                            {"$inc": {f"equipment.{ammo_slot}.quantity": -1}}
-                        )
-                        if dec_result.modified_count == 0:
-                            return RedirectResponse(f"/campaigns/{camp_id}/dashboard?error=Out%20of%20ammo", 303)
-
-        raw_dmg = actor["damage"] + bonus_dmg
-        multiplier = 1.0
-        if is_crit:
-            multiplier = 1.5 + (actor["crit_bonus"] / 100.0)
-            msg += "CRITICAL! "
+                    if weapon_type in ranged_types:
+                        if weapon_type == "Throwing":
+                            # Throwing uses its own quantity on the equipped weapon item
+                            if not weapon_item or weapon_item.get("quantity", 0) <= 0:
+                                return combat_response(request, camp_id, "Out of ammo")
+                            dec_result = await characters_collection.update_one(
+                                {
+                                    "_id": ObjectId(actor["id"]),
+                                    f"equipment.{weapon_slot}.id": weapon_item.get("id"),
+                                    f"equipment.{weapon_slot}.quantity": {"$gt": 0}
+                                },
+                                {"$inc": {f"equipment.{weapon_slot}.quantity": -1}}
+                            )
+                            if dec_result.modified_count == 0:
+                                return combat_response(request, camp_id, "Out of ammo")
+                        else:
+                            # Bows/Crossbows use separate Ammo category items
+                            ammo_slot = None
+                            ammo_item = None
+                            for slot in ("hand_off", "hand_main"):
+                                itm = equip.get(slot)
+                                if itm and itm.get("category") == "Ammo":
+                                    ammo_slot = slot
+                                    ammo_item = itm
+                                    break
+
+                            if not ammo_item or ammo_item.get("quantity", 0) <= 0:
+                                return combat_response(request, camp_id, "Out of ammo")
+
+                            # Decrement ammo quantity in the equipped slot, guard against negatives
+                            dec_result = await characters_collection.update_one(
+                                {
+                                    "_id": ObjectId(actor["id"]),
+                                    f"equipment.{ammo_slot}.id": ammo_item.get("id"),
+                                    f"equipment.{ammo_slot}.quantity": {"$gt": 0}
+                                },
+                                {"$inc": {f"equipment.{ammo_slot}.quantity": -1}}
+                            )
+                            if dec_result.modified_count == 0:
+                                return combat_response(request, camp_id, "Out of ammo")
+
+            raw_dmg = actor["damage"] + bonus_dmg
+            multiplier = 1.0
+            if is_crit:
+                multiplier = 1.5 + (actor["crit_bonus"] / 100.0)
+                msg += "CRITICAL! "
             
-        # Calculate Def (Base + Bonus)
-        total_def = target["defense"] + bonus_def
+            # Calculate Def (Base + Bonus)
+            total_def = target["defense"] + bonus_def
         
-        final_dmg = int(raw_dmg * multiplier) - total_def
-        if final_dmg < 0: final_dmg = 0
+            final_dmg = int(raw_dmg * multiplier) - total_def
+            if final_dmg < 0: final_dmg = 0
         
-        target["hp_current"] -= final_dmg
-         # --- DEATH LOGIC UPDATE ---
-        if target["hp_current"] <= 0:
-            target["hp_current"] = 0
-            target["action_points"] = 0
-            msg += f" {target['name']} is DOWN!"
+            target["hp_current"] -= final_dmg
+             # --- DEATH LOGIC UPDATE ---
+            if target["hp_current"] <= 0:
+                target["hp_current"] = 0
+                target["action_points"] = 0
+                msg += f" {target['name']} is DOWN!"
         
-        # Sync HP to Sheet (If Target is Player)
-        if target["type"] == "Player":
-            await characters_collection.update_one(
-                {"_id": ObjectId(target["id"])},
-                {"$set": {"status.hp_current": target["hp_current"]}}
-            )
-            
-        actor["action_points"] -= 100
-        msg += f"{actor['name']} hits {target['name']} for {final_dmg} damage."
+            actor["action_points"] -= 100
+            msg += f"{actor['name']} hits {target['name']} for {final_dmg} damage."
         
-        if target["hp_current"] == 0:
-            msg += f" {target['name']} is DOWN!"
-
-    # Log & Save
-    log.insert(0, msg)
-    if len(log) > 10: log.pop()
-
-    await campaigns_collection.update_one(
-        {"_id": ObjectId(camp_id)},
-        {"$set": {"combatants": combatants, "combat_log": log}}
-    )
-    return RedirectResponse(f"/campaigns/{camp_id}/dashboard", 303)
+            if target["hp_current"] == 0:
+                msg += f" {target['name']} is DOWN!"
+
+        # 2. Consume Stamina (Rule: 10 per action)
+        stamina_cost = 10
+        if actor["stamina_current"] >= stamina_cost:
+            actor["stamina_current"] -= stamina_cost
+        else:
+            actor["stamina_current"] = 0
+            # (Optional: Add "Exhausted" note to log if needed)
+
+        # 3. Log & Save (only the actor and target fields, newest log entry first)
+        set_ops = {
+            f"combatants.{actor_index}.stamina_current": actor["stamina_current"],
+            f"combatants.{actor_index}.action_points": actor["action_points"],
+        }
+        if action_type == "Attack":
+            set_ops[f"combatants.{target_index}.hp_current"] = target["hp_current"]
+            set_ops[f"combatants.{target_index}.action_points"] = target["action_points"]
+        try:
+            await session.commit(set_ops, msg)
+        except EncounterConflict:
+            return combat_response(request, camp_id, "Combat changed, try again")
+
+        # 4. Sync Stamina/HP to Sheets (If Player; written behind)
+        if actor["type"] == "Player":
+            session.sync_character(actor["id"], {"status.stamina": actor["stamina_current"]})
+        if action_type == "Attack" and target["type"] == "Player":
+            session.sync_character(target["id"], {"status.hp_current": target["hp_current"]})
+    return combat_response(request, camp_id)
+
+# --- COMBAT: LIVE STREAM (Server-Sent Events) ---
+@router.get("/campaigns/{camp_id}/combat/stream")
+async def combat_stream(camp_id: str, request: Request, user: dict = Depends(get_current_user)):
+    if not user: raise HTTPException(401)
+    camp, is_gm = await get_campaign_helper(camp_id, user)
+    is_member = any(m["user_id"] == user["id"] and m["status"] == "Accepted" for m in camp.get("members", []))
+    if not (is_gm or is_member): raise HTTPException(403)
+
+    async def events():
+        queue = subscribe(camp_id)
+        try:
+            session = await get_session(camp) if camp.get("combat_active") else None
+            first = session.snapshot() if session else {"type": "idle"}
+            yield f"data: {json.dumps(first, default=str)}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event["type"] == "resync":
+                    # The fight may have been reloaded or restarted since this stream opened
+                    live = await get_session(await campaigns_collection.find_one({"_id": camp["_id"]}) or camp)
+                    event = live.snapshot() if live else {"type": "end"}
+                yield f"data: {json.dumps(event, default=str)}\n\n"
+        finally:
+            unsubscribe(camp_id, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 # --- COMBAT: END ---
 @router.post("/campaigns/{camp_id}/combat/end")
 async def end_combat(camp_id: str, user: dict = Depends(get_current_user)):
     camp, is_gm = await get_campaign_helper(camp_id, user)
     
+    await close_session(camp_id)
+    await encounters_collection.update_many({"campaign_id": camp_id, "active": True}, {"$set": {"active": False}})
     await campaigns_collection.update_one(
         {"_id": ObjectId(camp_id)},
-        {"$set": {"combat_active": False, "combatants": []}}
+        {"$set": {"combat_active": False}, "$unset": {"combatants": "", "combat_log": ""}}
     )
     return RedirectResponse(f"/campaigns/{camp_id}/dashboard", 303)
\ No newline at end of file
@@ -0,0 +1,104 @@
+import numpy as np
+
+from app.game_rules import READY_AP, ACTION_COST
+
+# --- MONTE CARLO ENCOUNTER SIMULATOR ---
+# Runs many fights at once as (fights x combatants) arrays, using the same rules
+# as the combat tracker: the ATB speed race (next_turn), 10 stamina per action,
+# crit multiplier 1.5 + crit_bonus/100 and flat defense subtraction (combat_action).
+# The GM's hit/miss/crit call is modeled as fixed probabilities and every actor
+# attacks a random living opponent.
+
+STAMINA_COST = 10
+
+def _percentiles(values):
+    if values.size == 0:
+        return {"mean": None, "p10": None, "p50": None, "p90": None}
+    p10, p50, p90 = np.percentile(values, [10, 50, 90])
+    return {"mean": round(float(values.mean()), 2), "p10": round(float(p10), 2), "p50": round(float(p50), 2), "p90": round(float(p90), 2)}
+
+def simulate_encounter(combatants: list, fights: int = 10000, hit_chance: float = 0.75,
+                       crit_chance: float = 0.05, max_turns: int = 500, seed=None):
+    """
+    `combatants` are Combatant dicts (see start_combat). Returns win rate,
+    turns-to-victory and party HP-loss distributions.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(combatants)
+
+    is_enemy = np.array([c["type"] == "Enemy" for c in combatants])
+    speed = np.array([c["speed"] for c in combatants], dtype=np.float64)
+    damage = np.array([c["damage"] for c in combatants], dtype=np.float64)
+    defense = np.array([c["defense"] for c in combatants], dtype=np.float64)
+    crit_mult = np.array([1.5 + c["crit_bonus"] / 100.0 for c in combatants])
+
+    hp = np.tile(np.array([c["hp_current"] for c in combatants], dtype=np.float64), (fights, 1))
+    ap = np.tile(np.array([c.get("action_points", 0.0) for c in combatants], dtype=np.float64), (fights, 1))
+    stamina = np.tile(np.array([c.get("stamina_current", 0) for c in combatants], dtype=np.float64), (fights, 1))
+    start_party_hp = hp[:, ~is_enemy].sum(axis=1)
+
+    turns = np.zeros(fights, dtype=np.int64)
+    stalled = np.zeros(fights, dtype=bool)
+    rows = np.arange(fights)
+
+    while True:
+        alive = hp > 0
+        party_up = (alive & ~is_enemy).any(axis=1)
+        enemies_up = (alive & is_enemy).any(axis=1)
+        active = party_up & enemies_up & ~stalled & (turns < max_turns)
+        if not active.any(): break
+
+        # 1. Speed race: jump every fight to its next ready tick
+        with np.errstate(divide="ignore", invalid="ignore"):
+            wait = np.where(ap >= READY_AP, 0.0, np.ceil((READY_AP - ap) / speed))
+        wait = np.where(alive & ((ap >= READY_AP) | (speed > 0)), wait, np.inf)
+        ticks = wait.min(axis=1)
+        stalled |= active & np.isinf(ticks)
+        active &= ~np.isinf(ticks)
+        if not active.any(): break
+
+        step = np.where(active, ticks, 0.0)[:, None]
+        ap += np.where(alive, speed * step, 0.0)
+
+        # 2. Actor: highest AP among the living (first in list order on ties)
+        actor = np.where(alive, ap, -np.inf).argmax(axis=1)
+
+        # 3. Target: a random living opponent
+        opponent = alive & (is_enemy[None, :] != is_enemy[actor][:, None])
+        target = np.where(opponent, rng.random((fights, n)), -1.0).argmax(axis=1)
+
+        # 4. Resolve: hit/crit roll, damage - defense (floored at 0)
+        roll = rng.random(fights)
+        hit = roll < hit_chance
+        crit = roll < crit_chance
+        mult = np.where(crit, crit_mult[actor], 1.0)
+        dealt = np.maximum(np.trunc(damage[actor] * mult) - defense[target], 0.0)
+        dealt = np.where(hit & active, dealt, 0.0)
+
+        hp[rows, target] -= dealt
+        down = active & (hp[rows, target] <= 0)
+        hp[rows[down], target[down]] = 0
+        ap[rows[down], target[down]] = 0
+
+        ap[rows[active], actor[active]] -= ACTION_COST
+        stamina[rows[active], actor[active]] = np.maximum(stamina[rows[active], actor[active]] - STAMINA_COST, 0)
+        turns += active
+
+    alive = hp > 0
+    party_won = (alive & ~is_enemy).any(axis=1) & ~(alive & is_enemy).any(axis=1)
+    party_lost = ~(alive & ~is_enemy).any(axis=1)
+    draws = ~party_won & ~party_lost
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hp_loss = np.where(start_party_hp > 0, 1.0 - hp[:, ~is_enemy].sum(axis=1) / start_party_hp, 0.0)
+
+    return {
+        "fights": fights,
+        "win_rate": round(float(party_won.mean()), 4),
+        "loss_rate": round(float(party_lost.mean()), 4),
+        "draw_rate": round(float(draws.mean()), 4),
+        "turns_to_victory": _percentiles(turns[party_won]),
+        "party_hp_loss_pct": _percentiles(hp_loss[party_won] * 100),
+        "party_downed": _percentiles((~alive[:, ~is_enemy]).sum(axis=1)[party_won]),
+        "party_stamina_left": _percentiles(stamina[:, ~is_enemy].sum(axis=1)[party_won]),
+    }
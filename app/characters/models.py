@@ -116,6 +116,18 @@ class CharacterInDB(CharacterBase):
     # NOW THIS WILL WORK because Fief is defined above
     fiefs: List[Fief] = [] 
 
+    # Materialized output of game_rules.compute_derived_stats + "rules_version"
+    derived: Optional[Dict] = None
+
     class Config:
         populate_by_name = True
-        arbitrary_types_allowed = True
\ No newline at end of file
+        arbitrary_types_allowed = True
+
+# --- SUMMARY READ MODEL ---
+# What listings and pickers (dashboard, campaign list, join flow) need from a
+# character. Use as a find() projection instead of loading inventory, fiefs,
+# notes and skill trees.
+CHARACTER_SUMMARY_PROJECTION = {
+    "name": 1, "class_archetype": 1, "image_url": 1, "user_id": 1,
+    "status.level": 1, "status.hp_current": 1, "status.hp_max": 1,
+}
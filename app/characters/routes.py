@@ -1,16 +1,18 @@
 from fastapi import APIRouter, Depends, Request, Form, status, HTTPException
-from fastapi.responses import RedirectResponse, HTMLResponse
+from fastapi.responses import RedirectResponse, HTMLResponse, StreamingResponse
 from app.templates import templates
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 from app.database import characters_collection, users_collection
 from app.auth.dependencies import get_current_user
+from app.core.pagination import keyset_page, stream_ndjson
 from app.characters.models import (
     CharacterCreate, CharacterInDB, AttributesBlock, 
     AttributeData, SkillData, Status, Points, Equipment,
-    Fief, FiefType, ItemCategory, InventoryItem
+    Fief, FiefType, ItemCategory, InventoryItem, CHARACTER_SUMMARY_PROJECTION
 )
-from app.game_rules import SKILL_CATEGORIES, get_skill_tree, calculate_derived_stats
+from app.game_rules import SKILL_CATEGORIES, get_skill_tree, get_derived_stats, is_derived_current, materialize_derived_stats
 
 router = APIRouter()
 
@@ -31,17 +33,45 @@ async def get_character_helper(char_id: str, user: dict):
         
     return char, is_owner, is_gm
 
+# --- HELPER: Keep the Materialized Derived Stats in Sync ---
+# Every mutation bumps the character's "revision". The derived block is only
+# stored if the document is still at the revision it was computed from, so a
+# slower request can never overwrite it with stats from an older state.
+async def save_derived_stats(char: dict):
+    derived = await materialize_derived_stats(char)
+    await characters_collection.update_one(
+        {"_id": char["_id"], "revision": char.get("revision")},
+        {"$set": {"derived": derived, "status.hp_max": 100 + derived["bonus_hp"]}}
+    )
+    char["derived"] = derived
+    return derived
+
+async def update_character(char_id, update_ops: dict):
+    """Applies a mutation that affects derived stats and recomputes them from the result."""
+    update_ops = {**update_ops, "$inc": {**update_ops.get("$inc", {}), "revision": 1}}
+    char = await characters_collection.find_one_and_update(
+        {"_id": char_id}, update_ops, return_document=ReturnDocument.AFTER
+    )
+    if char:
+        await save_derived_stats(char)
+    return char
+
 # --- ROUTES ---
 
 @router.get("/dashboard", response_class=HTMLResponse)
-async def dashboard(request: Request, user: dict = Depends(get_current_user)):
+async def dashboard(request: Request, after: str = None, stream: bool = False, user: dict = Depends(get_current_user)):
     if not user: return RedirectResponse("/auth/login", status.HTTP_303_SEE_OTHER)
     
     query = {} if user["role"] == "GM" else {"user_id": ObjectId(user["id"])}
-    characters = await characters_collection.find(query).to_list(100)
+    if stream:
+        # Whole roster as NDJSON, row by row (GM tools with thousands of NPCs)
+        return StreamingResponse(stream_ndjson(characters_collection, query, CHARACTER_SUMMARY_PROJECTION), media_type="application/x-ndjson")
+
+    characters, next_cursor = await keyset_page(characters_collection, query, CHARACTER_SUMMARY_PROJECTION, after)
     
     return templates.TemplateResponse("dashboard.html", {
-        "request": request, "user": user, "characters": characters
+        "request": request, "user": user, "characters": characters,
+        "next_cursor": next_cursor, "is_first_page": not after
     })
 
 @router.get("/characters/new", response_class=HTMLResponse)
@@ -87,6 +117,7 @@ async def create_character(
         "fiefs": [],
         "image_url": "https://cdn-icons-png.flaticon.com/512/53/53625.png"
     }
+    new_char["derived"] = await materialize_derived_stats(new_char)
     
     await characters_collection.insert_one(new_char)
     return RedirectResponse("/dashboard", status.HTTP_303_SEE_OTHER)
@@ -111,17 +142,15 @@ async def view_sheet(char_id: str, request: Request, user: dict = Depends(get_cu
     if not (is_owner or is_gm):
         char["private_notes"] = "" 
 
-    # 4. Calculate Stats (Async)
-    derived = await calculate_derived_stats(char)
+    # 4. Derived Stats (materialized on every mutation; only rebuilt here if the rules changed)
+    if is_derived_current(char) or not (is_owner or is_gm):
+        derived = await get_derived_stats(char)
+    else:
+        derived = await save_derived_stats(char)
     
-    # 5. Auto-Update Max Stats in DB if changed
     final_max_hp = 100 + derived["bonus_hp"]
     final_max_stamina = 100 + derived["bonus_stamina"]
-    
-    if char["status"]["hp_max"] != final_max_hp:
-        if is_owner or is_gm:
-            await characters_collection.update_one({"_id": char["_id"]}, {"$set": {"status.hp_max": final_max_hp}})
-        char["status"]["hp_max"] = final_max_hp
+    char["status"]["hp_max"] = final_max_hp
 
     return templates.TemplateResponse("character_sheet.html", {
         "request": request, 
@@ -197,7 +226,7 @@ async def unlock_node(
         "$inc": {"points.skill_points": -1} # <--- CHANGED: Deduct points for everyone (including GM)
     }
 
-    await characters_collection.update_one({"_id": char["_id"]}, update_ops)
+    await update_character(char["_id"], update_ops)
     return RedirectResponse(f"/characters/{char_id}/skills/{attribute}/{skill}", 303)
 
 # --- ACTION: Update Attributes (The Reset/Save Logic) ---
@@ -252,8 +281,8 @@ async def add_item(
     char, is_owner, is_gm = await get_character_helper(char_id, user)
     if not is_gm: return RedirectResponse(f"/characters/{char_id}?error=GM Only", 303)
 
-    # 1. Calculate Stats (Async)
-    derived = await calculate_derived_stats(char)
+    # 1. Derived Stats (Materialized)
+    derived = await get_derived_stats(char)
     
     # 2. Check Weight Limit
     # We use the 'current_load' and 'max_load' returned by the calculator
@@ -267,10 +296,7 @@ async def add_item(
         carry_bonus_kg=carry_bonus, is_two_handed=is_two_handed
     )
     
-    await characters_collection.update_one(
-        {"_id": char["_id"]}, 
-        {"$push": {"inventory": new_item.model_dump()}}
-    )
+    await update_character(char["_id"], {"$push": {"inventory": new_item.model_dump()}})
     
     return RedirectResponse(f"/characters/{char_id}", 303)
 
@@ -281,7 +307,7 @@ async def delete_item(char_id: str, item_id: str = Form(...), user: dict = Depen
     char, is_owner, is_gm = await get_character_helper(char_id, user)
     if not is_gm: return RedirectResponse(f"/characters/{char_id}?error=GM Only", 303)
     
-    await characters_collection.update_one({"_id": char["_id"]}, {"$pull": {"inventory": {"id": item_id}}})
+    await update_character(char["_id"], {"$pull": {"inventory": {"id": item_id}}})
     return RedirectResponse(f"/characters/{char_id}", 303)
 
 # --- ACTION: Equip Item (Updated Logic) ---
@@ -313,7 +339,7 @@ async def equip_item(char_id: str, item_id: str = Form(...), slot: str = Form(..
             if main and main.get("is_two_handed", False): return RedirectResponse(f"/characters/{char_id}?error=Main hand busy", 303)
             update_ops["$set"] = {"equipment.hand_off": item}
 
-    await characters_collection.update_one({"_id": char["_id"]}, update_ops)
+    await update_character(char["_id"], update_ops)
     return RedirectResponse(f"/characters/{char_id}", 303)
 
 # --- ACTION: Unequip Item (Updated) ---
@@ -329,7 +355,7 @@ async def unequip_item(char_id: str, slot: str = Form(...), user: dict = Depends
     item = char["equipment"].get(slot) if slot in ["armor", "horse"] else char["equipment"].get(f"hand_{slot}")
     if not item: return RedirectResponse(f"/characters/{char_id}", 303)
     
-    await characters_collection.update_one({"_id": char["_id"]}, {"$set": {db_field: None}, "$push": {"inventory": item}})
+    await update_character(char["_id"], {"$set": {db_field: None}, "$push": {"inventory": item}})
     return RedirectResponse(f"/characters/{char_id}", 303)
 
 # --- ACTION: Update Character Image ---
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,6 +8,21 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
     LANGUAGE: str = "en_US" # Default language
+    COMBAT_FLUSH_SECONDS: float = 2.0 # Write-behind interval for live combat sessions
+    SKILL_RULES_POLL_SECONDS: float = 30.0 # How often skills_rules is re-checked when MongoDB has no change streams
+    WIKI_CACHE_BACKEND: str = "memory" # Rendered wiki pages: "memory" (per worker LRU) or "disk" (shared)
+    WIKI_CACHE_SIZE: int = 256
+    WIKI_CACHE_DIR: str = ".cache/wiki"
+    WIKI_VERSION_CHECK_SECONDS: float = 2.0 # How stale per-worker wiki caches may be after an edit elsewhere
+    REVOCATION_CHECK_SECONDS: float = 2.0 # How long a token logged out on one worker may still work on the others
+    # Argon2 cost; unset keeps the library defaults. Changing them rehashes each password on its owner's next login.
+    ARGON2_TIME_COST: Optional[int] = None
+    ARGON2_MEMORY_COST: Optional[int] = None # KiB
+    ARGON2_PARALLELISM: Optional[int] = None
+    PASSWORD_HASH_WORKERS: int = 2 # Threads hashing at once
+    PASSWORD_HASH_QUEUE: int = 32 # Hashes running or waiting before logins are turned away
+    PRODUCTION: bool = False # Precompile templates at boot, no auto-reload, persistent bytecode cache
+    TEMPLATE_CACHE_DIR: str = ".cache/jinja"
 
     class Config:
         env_file = ".env"
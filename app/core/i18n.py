@@ -1,42 +1,181 @@
+import hashlib
 import json
 import os
+import re
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
 from app.config import settings
 
-# Global dictionary to hold translations
-_translations = {}
+# --- CATALOGS ---
+# One catalog per app/locales/<locale>.json, loaded the first time a request
+# needs it and kept for the life of the worker, so tables in different
+# languages share a worker. Keys are the English texts, so "en_US" (or any
+# locale without a file) falls back to the keys themselves.
+#
+# Messages with {placeholders} are also compiled once into a tuple of
+# (literal, field) parts that trans_with_params joins without rescanning
+# the string.
+
+LOCALES_DIR = "app/locales"
+LOCALE_COOKIE = "lang"
+PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+_default_locale = settings.LANGUAGE
+_catalogs = {}        # locale -> {key: text}
+_formats = {}         # locale -> {key: parts} for messages with placeholders
+_compiled_keys = {}   # untranslated keys used with params, compiled once
+_locales = None
+_current_locale = ContextVar("locale", default=None)
+
+def compile_message(text: str):
+    """Parts of a message with placeholders, or None when it has none."""
+    parts, pos = [], 0
+    for m in PLACEHOLDER_RE.finditer(text):
+        parts.append((text[pos:m.start()], m.group(1)))
+        pos = m.end()
+    if not parts: return None
+    parts.append((text[pos:], None))
+    return tuple(parts)
+
+def available_locales():
+    global _locales
+    if _locales is None:
+        try:
+            files = {name[:-5] for name in os.listdir(LOCALES_DIR) if name.endswith(".json")}
+        except OSError:
+            files = set()
+        # The keys are English, so en_US never needs a file
+        _locales = sorted(files | {"en_US"})
+    return _locales
+
+def get_catalog(lang: str):
+    catalog = _catalogs.get(lang)
+    if catalog is not None: return catalog
 
-def load_translations(lang: str):
-    """Loads the JSON file for the specific language."""
-    global _translations
-    
     # Path to your json file
-    file_path = f"app/locales/{lang}.json"
-    
-    if not os.path.exists(file_path):
+    file_path = f"{LOCALES_DIR}/{lang}.json"
+    catalog = {}
+    if os.path.exists(file_path):
+        with open(file_path, "r", encoding="utf-8") as f:
+            catalog = json.load(f)
+    elif not lang.startswith("en"):
         print(f"Warning: Translation file {file_path} not found. Defaulting to keys.")
-        _translations = {}
-        return
 
-    with open(file_path, "r", encoding="utf-8") as f:
-        _translations = json.load(f)
+    formats = {}
+    for key, text in catalog.items():
+        parts = compile_message(text)
+        if parts: formats[key] = parts
+    _formats[lang] = formats
+    _catalogs[lang] = catalog
+    return catalog
+
+def catalog_version(lang: str):
+    """Short digest of a catalog; changes whenever its translations do."""
+    payload = json.dumps(get_catalog(lang), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:10]
+
+def load_translations(lang: str):
+    """Sets the default locale (settings.LANGUAGE) and loads its catalog up front."""
+    global _default_locale
+    _default_locale = lang
+    get_catalog(lang)
+
+# --- PER-REQUEST LOCALE ---
+def get_locale():
+    return _current_locale.get() or _default_locale
+
+def set_locale(lang: str):
+    """Sets the locale for the current context; returns a token for reset_locale."""
+    return _current_locale.set(lang)
+
+def reset_locale(token):
+    _current_locale.reset(token)
+
+def match_locale(tag: str, locales: list):
+    """'pt-BR' -> 'pt_BR'; 'pt' -> the first 'pt_*' locale. None if nothing fits."""
+    tag = tag.strip().replace("-", "_")
+    if not tag: return None
+    for lang in locales:
+        if lang.lower() == tag.lower(): return lang
+    prefix = tag.split("_")[0].lower()
+    for lang in locales:
+        if lang.split("_")[0].lower() == prefix: return lang
+    return None
+
+def resolve_locale(cookie_value: str = None, accept_language: str = None):
+    """Locale for a request: the 'lang' cookie, then Accept-Language, then settings.LANGUAGE."""
+    locales = available_locales()
+    if _default_locale not in locales: locales = locales + [_default_locale]
+
+    if cookie_value:
+        lang = match_locale(cookie_value, locales)
+        if lang: return lang
+
+    ranked = []
+    for i, item in enumerate((accept_language or "").split(",")):
+        tag, _, q = item.partition(";q=")
+        try:
+            weight = float(q) if q else 1.0
+        except ValueError:
+            weight = 0.0
+        if tag.strip() and tag.strip() != "*" and weight > 0: ranked.append((-weight, i, tag))
+    for _, _, tag in sorted(ranked):
+        lang = match_locale(tag, locales)
+        if lang: return lang
+    return _default_locale
+
+class LocaleMiddleware:
+    """ASGI middleware: resolves the locale once per request and exposes it through get_locale()."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        cookie = SimpleCookie()
+        try:
+            cookie.load(headers.get(b"cookie", b"").decode("latin-1"))
+        except Exception:
+            pass
+        morsel = cookie.get(LOCALE_COOKIE)
+        lang = resolve_locale(morsel.value if morsel else None, headers.get(b"accept-language", b"").decode("latin-1"))
+
+        token = set_locale(lang)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_locale(token)
+
+# --- LOOKUPS ---
+def translate(text: str, lang: str):
+    """Lookup in an explicit locale (used when templates are compiled for that locale)."""
+    return get_catalog(lang).get(text, text)
 
 def trans(text: str):
     """
-    Looks up the text in the loaded dictionary. 
+    Looks up the text in the current locale's catalog.
     If not found, returns the original text.
     """
-    return _translations.get(text, text)
+    return get_catalog(get_locale()).get(text, text)
 
 def trans_with_params(text: str, params: dict):
     """
-    Lookup translation and replace placeholders like {actor}, {target}, {dmg}, etc.
-    Params keys are interpolated via simple string replacement.
+    Lookup translation and fill placeholders like {actor}, {target}, {dmg}, etc.
+    Unknown placeholders are left as they are.
     """
-    template = _translations.get(text, text)
-    if not params:
-        return template
-    # simple, safe replacement
-    for k, v in params.items():
-        placeholder = "{" + k + "}"
-        template = template.replace(placeholder, str(v))
-    return template
\ No newline at end of file
+    lang = get_locale()
+    catalog = get_catalog(lang)
+    if text in catalog:
+        parts = _formats[lang].get(text)
+    else:
+        if text not in _compiled_keys: _compiled_keys[text] = compile_message(text)
+        parts = _compiled_keys[text]
+    if not params or not parts:
+        return catalog.get(text, text)
+    out = []
+    for literal, field in parts:
+        out.append(literal)
+        if field: out.append(str(params[field]) if field in params else "{" + field + "}")
+    return "".join(out)
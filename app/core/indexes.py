@@ -0,0 +1,115 @@
+import asyncio
+import sys
+from datetime import datetime
+from bson import ObjectId
+from pymongo import IndexModel, ASCENDING
+from pymongo.errors import PyMongoError
+
+from app.database import db
+
+# --- INDEX REGISTRY ---
+# Every index the app relies on, per collection. Applied at startup by
+# ensure_indexes(); create_indexes is a no-op for indexes that already exist.
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "characters": [
+        # (owner, _id) also serves the keyset-paginated dashboard
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "campaigns": [
+        # (key, _id) pairs serve the keyset-paginated campaign list sections
+        IndexModel([("gm_id", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("members.user_id", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("members.user_id", ASCENDING), ("status", ASCENDING)]),
+        IndexModel([("members.character_id", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "encounters": [
+        IndexModel([("campaign_id", ASCENDING), ("active", ASCENDING)]),
+        # At most one running fight per campaign
+        IndexModel([("campaign_id", ASCENDING)], unique=True, partialFilterExpression={"active": True}, name="one_active_encounter"),
+    ],
+    "skills_rules": [
+        IndexModel([("name", ASCENDING)], unique=True),
+    ],
+    "wiki": [
+        IndexModel([("title", ASCENDING)]),
+        IndexModel([("title_key", ASCENDING)]),
+        IndexModel([("links", ASCENDING)]),
+    ],
+    "wiki_revisions": [
+        IndexModel([("page_id", ASCENDING), ("rev", ASCENDING)], unique=True),
+    ],
+    "revoked_tokens": [
+        # Entries go away once the token could no longer be used anyway
+        IndexModel([("exp", ASCENDING)], expireAfterSeconds=0),
+        IndexModel([("revoked_at", ASCENDING)]),
+    ],
+}
+
+async def ensure_indexes(database=db):
+    for collection, indexes in INDEXES.items():
+        try:
+            await database[collection].create_indexes(indexes)
+        except PyMongoError as e:
+            # e.g. duplicate emails left over from before the unique index
+            print(f"Warning: could not build indexes on '{collection}' ({e}).")
+
+# --- QUERY PLAN VERIFICATION ---
+# Representative shapes of the route queries (collection, filter, sort).
+# verify_query_plans() explains each one and reports any COLLSCAN.
+_sample_id = str(ObjectId())
+
+QUERY_SHAPES = [
+    ("users", {"email": "gm@example.com"}, None),
+    ("characters", {"user_id": ObjectId(_sample_id)}, None),
+    ("characters", {"user_id": ObjectId(_sample_id), "_id": {"$gt": ObjectId(_sample_id)}}, [("_id", ASCENDING)]),
+    ("campaigns", {"gm_id": _sample_id}, None),
+    ("campaigns", {"members.user_id": _sample_id}, None),
+    ("campaigns", {"gm_id": _sample_id, "_id": {"$gt": ObjectId(_sample_id)}}, [("_id", ASCENDING)]),
+    ("campaigns", {"members.user_id": _sample_id, "_id": {"$gt": ObjectId(_sample_id)}}, [("_id", ASCENDING)]),
+    ("campaigns", {"_id": ObjectId(_sample_id), "members.character_id": _sample_id}, None),
+    ("campaigns", {"members.character_id": _sample_id}, None),
+    ("campaigns", {"gm_id": {"$ne": _sample_id}, "members.user_id": {"$ne": _sample_id}, "status": "Active"}, [("_id", ASCENDING)]),
+    ("encounters", {"campaign_id": _sample_id, "active": True}, None),
+    ("skills_rules", {"name": "One-Handed"}, None),
+    ("wiki", {}, [("title", ASCENDING)]),
+    ("wiki", {"title_key": {"$in": ["ferrum", "imperium"]}}, None),
+    ("wiki", {"links": "ferrum"}, [("title", ASCENDING)]),
+    ("wiki_revisions", {"page_id": _sample_id, "rev": {"$lte": 5}, "kind": "snapshot"}, [("rev", -1)]),
+    ("revoked_tokens", {"exp": {"$gt": datetime(2026, 1, 1)}, "revoked_at": {"$gt": datetime(2026, 1, 1)}}, None),
+]
+
+def _plan_stages(plan: dict):
+    """Yields every stage name in an explain() plan tree."""
+    if not isinstance(plan, dict): return
+    if "stage" in plan: yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        yield from _plan_stages(plan.get(key))
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+async def verify_query_plans(database=db):
+    """Returns the query shapes whose winning plan contains a COLLSCAN."""
+    failures = []
+    for collection, query, sort in QUERY_SHAPES:
+        cursor = database[collection].find(query)
+        if sort: cursor = cursor.sort(sort)
+        plan = (await cursor.explain())["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in set(_plan_stages(plan)):
+            failures.append((collection, query, sort))
+    return failures
+
+async def main():
+    await ensure_indexes()
+    failures = await verify_query_plans()
+    for collection, query, sort in failures:
+        print(f"COLLSCAN: {collection} find({query}) sort={sort}")
+    print(f"{len(QUERY_SHAPES) - len(failures)}/{len(QUERY_SHAPES)} query shapes use an index.")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    # python -m app.core.indexes  (against the MONGO_URL/DB_NAME in .env)
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,30 @@
+import json
+from bson import ObjectId
+
+PAGE_SIZE = 50
+
+# --- KEYSET PAGINATION ---
+# Pages walk `_id` ascending: the next page starts after the last _id seen, so
+# every page is an index range scan no matter how deep the GM scrolls
+# (skip/limit would re-read all earlier rows).
+
+def parse_cursor(after: str = None):
+    """The `after` query param as an ObjectId (None for the first page or a bad value)."""
+    return ObjectId(after) if after and ObjectId.is_valid(after) else None
+
+async def keyset_page(collection, query: dict, projection: dict = None, after: str = None, limit: int = PAGE_SIZE):
+    """Returns (docs, next_cursor). next_cursor is None on the last page."""
+    start = parse_cursor(after)
+    if start: query = {**query, "_id": {"$gt": start}}
+
+    # One extra row tells us whether another page exists
+    docs = await collection.find(query, projection).sort("_id", 1).limit(limit + 1).to_list(limit + 1)
+    if len(docs) > limit:
+        return docs[:limit], str(docs[limit - 1]["_id"])
+    return docs, None
+
+# --- STREAMING ---
+async def stream_ndjson(collection, query: dict, projection: dict = None):
+    """Yields one JSON line per document as the Motor cursor fetches its batches."""
+    async for doc in collection.find(query, projection).sort("_id", 1):
+        yield json.dumps(doc, default=str) + "\n"
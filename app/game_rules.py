@@ -1,3 +1,11 @@
+import asyncio
+import hashlib
+import heapq
+import json
+import math
+import random
+from pymongo.errors import OperationFailure, PyMongoError
+from app.config import settings
 from app.database import db
 
 # --- Rules of the Empire ---
@@ -28,6 +36,58 @@ DIFFICULTY_LEVELS = {
     5: 20   # Legendary (Only Nat 20)
 }
 
+# --- CHECK PROBABILITIES (d20) ---
+# A check succeeds on d20 >= DC, where DC = DIFFICULTY_LEVELS[level] - attribute // 2
+# (never below 2). A natural 20 is a critical success, a natural 1 a fumble.
+DIE_FACES = 20
+MIN_DC = 2
+MAX_ATTRIBUTE_VALUE = 40 # DC is already floored at 2 for every level past this
+
+def check_dc(difficulty: int, attr_value: int):
+    base_dc = DIFFICULTY_LEVELS.get(difficulty, DIFFICULTY_LEVELS[3])
+    return max(base_dc - attr_value // 2, MIN_DC)
+
+def check_odds(difficulty: int, attr_value: int):
+    """Exact odds of a check: faces out of DIE_FACES plus the matching probabilities."""
+    dc = check_dc(difficulty, attr_value)
+    success_faces = max(DIE_FACES - dc + 1, 1) # a natural 20 always succeeds
+    return {
+        "dc": dc,
+        "success_faces": success_faces,
+        "success": success_faces / DIE_FACES,
+        "crit": 1 / DIE_FACES,
+        "fumble": 1 / DIE_FACES,
+    }
+
+def build_check_table():
+    """Odds for every difficulty x attribute value (0..MAX_ATTRIBUTE_VALUE)."""
+    return {
+        str(level): {
+            "base_dc": base_dc,
+            "checks": [check_odds(level, attr) for attr in range(MAX_ATTRIBUTE_VALUE + 1)],
+        }
+        for level, base_dc in DIFFICULTY_LEVELS.items()
+    }
+
+CHECK_TABLE = build_check_table()
+
+def lookup_check(difficulty: int, attr_value: int):
+    level = CHECK_TABLE.get(str(difficulty), CHECK_TABLE["3"])
+    return level["checks"][min(max(attr_value, 0), MAX_ATTRIBUTE_VALUE)]
+
+def resolve_check(difficulty: int, attr_value: int, roll: int = None):
+    """Rolls (or takes) a d20 and resolves it against the check's DC."""
+    odds = lookup_check(difficulty, attr_value)
+    if roll is None: roll = random.randint(1, DIE_FACES)
+    return {
+        "roll": roll,
+        "dc": odds["dc"],
+        "success": roll == DIE_FACES or (roll != 1 and roll >= odds["dc"]),
+        "crit": roll == DIE_FACES,
+        "fumble": roll == 1,
+        "chance": odds["success"],
+    }
+
 # --- STANDARD ACTIONS DATABASE ---
 # This populates the dropdown in the simulator
 DEFAULT_GAME_ACTIONS = [
@@ -57,6 +117,62 @@ async def get_game_actions():
         actions.append({"name": d.get("name", "Unnamed Action"), "attribute": d.get("attribute", "")})
     return actions
 
+# --- COMBAT TURN SCHEDULER (ATB) ---
+# Every tick, each living combatant gains `speed` action points; whoever reaches
+# READY_AP acts. Instead of simulating tick by tick, ticks-to-ready is computed
+# directly: ceil((READY_AP - ap) / speed).
+READY_AP = 100
+ACTION_COST = 100
+
+def ticks_until_ready(action_points: float, speed: int):
+    """Ticks a combatant needs to reach READY_AP, or None if it never will."""
+    if action_points >= READY_AP: return 0
+    if speed <= 0: return None
+    return math.ceil((READY_AP - action_points) / speed)
+
+def advance_to_next_turn(combatants: list):
+    """
+    Fast-forwards the speed race to the first tick where a living combatant is
+    ready, mutating action_points in place. Returns the ticks elapsed, 0 if
+    someone was already ready, or None if no living combatant can ever act.
+    """
+    living = [c for c in combatants if c["hp_current"] > 0]
+    waits = [ticks_until_ready(c["action_points"], c["speed"]) for c in living]
+    waits = [w for w in waits if w is not None]
+    if not waits: return None
+
+    ticks = min(waits)
+    if ticks > 0:
+        for c in living:
+            c["action_points"] += c["speed"] * ticks
+    return ticks
+
+def predict_turn_order(combatants: list, k: int = 10):
+    """
+    The next `k` turns, assuming every actor spends ACTION_COST when it acts.
+    Ties on the same tick go to the higher action points, then list order,
+    matching the dashboard's ready check.
+    """
+    queue = []
+    for idx, c in enumerate(combatants):
+        if c["hp_current"] <= 0: continue
+        wait = ticks_until_ready(c["action_points"], c["speed"])
+        if wait is None: continue
+        ap = c["action_points"] + c["speed"] * wait
+        heapq.heappush(queue, (wait, -ap, idx))
+
+    timeline = []
+    while queue and len(timeline) < k:
+        tick, neg_ap, idx = heapq.heappop(queue)
+        c = combatants[idx]
+        timeline.append({"index": idx, "id": c["id"], "name": c["name"], "type": c["type"], "tick": tick})
+
+        ap = -neg_ap - ACTION_COST
+        wait = ticks_until_ready(ap, c["speed"])
+        if wait is None: continue
+        heapq.heappush(queue, (tick + wait, -(ap + c["speed"] * wait), idx))
+    return timeline
+
 # --- Skill Tree Logic ---
 
 def get_node_requirements(tier: int):
@@ -71,16 +187,155 @@ def generate_empty_tree():
         tree.append({"tier": i, "required_attribute_val": i*2, "choices": choices})
     return tree
 
+# --- Compiled Rules Cache ---
+# The skills_rules collection is compiled once into in-process lookups so that
+# derived stats never hit the database. Keys are (skill, tier, choice_index).
+# Rules are edited outside the app (seed scripts, mongosh), so a background
+# task keeps the cache in step: a change stream where MongoDB offers one
+# (replica sets), otherwise a poll of the rules hash.
+CHANGE_STREAMS_UNSUPPORTED = 40573 # "$changeStream is only supported on replica sets"
+MAX_WATCH_BACKOFF = 60
+
+_skill_trees = {}
+_skill_modifiers = {}
+_rules_loaded = False
+_rules_version = None
+_rules_watcher = None
+
+def compile_skill_rules(docs: list):
+    """Builds the tree lookup and the flat (skill, tier, choice) -> modifiers index."""
+    trees = {}
+    modifiers = {}
+    for doc in docs:
+        name = doc.get("name")
+        if not name or name in trees: continue
+        tree = doc.get("tree", [])
+        trees[name] = tree
+
+        seen_tiers = set()
+        for node in tree:
+            tier = node.get("tier")
+            # Keep the first node per tier, same as the old linear scan
+            if tier is None or tier in seen_tiers: continue
+            seen_tiers.add(tier)
+            for idx, choice in enumerate(node.get("choices", [])):
+                modifiers[(name, tier, idx)] = tuple(
+                    (mod["stat"], mod["value"], mod.get("condition", "always"))
+                    for mod in choice.get("modifiers", [])
+                )
+    return trees, modifiers
+
+def hash_skill_rules(docs: list):
+    """Content hash of the rules, identical across workers and restarts."""
+    payload = sorted(({"name": d.get("name"), "tree": d.get("tree", [])} for d in docs), key=lambda d: str(d["name"]))
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+
+async def load_skill_rules(only_if_changed: bool = False):
+    """(Re)loads every skill tree from MongoDB into the compiled cache. Returns True if it recompiled."""
+    global _skill_trees, _skill_modifiers, _rules_loaded, _rules_version
+    docs = await skills_rules_collection.find().to_list(None)
+    version = hash_skill_rules(docs)
+    if only_if_changed and _rules_loaded and version == _rules_version: return False
+    _skill_trees, _skill_modifiers = compile_skill_rules(docs)
+    _rules_version = version
+    _rules_loaded = True
+    return True
+
+async def ensure_skill_rules():
+    if not _rules_loaded:
+        await load_skill_rules()
+
+async def watch_skill_rules():
+    """Reloads the compiled cache whenever a rule document changes. Retries a lost stream with backoff."""
+    backoff = 1
+    while True:
+        try:
+            async with skills_rules_collection.watch() as stream:
+                # Edits made while no stream was open
+                await load_skill_rules(only_if_changed=True)
+                backoff = 1
+                async for _ in stream:
+                    await load_skill_rules()
+        except OperationFailure as e:
+            if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                print(f"Note: no change streams on this MongoDB; polling skills_rules every {settings.SKILL_RULES_POLL_SECONDS:g} s.")
+                return await poll_skill_rules()
+            print(f"Warning: skills_rules change stream failed ({e}). Retrying in {backoff} s.")
+        except Exception as e:
+            print(f"Warning: skills_rules change stream failed ({e!r}). Retrying in {backoff} s.")
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, MAX_WATCH_BACKOFF)
+
+async def poll_skill_rules():
+    """Recompiles the cache whenever the stored rules hash no longer matches it."""
+    while True:
+        await asyncio.sleep(settings.SKILL_RULES_POLL_SECONDS)
+        try:
+            await load_skill_rules(only_if_changed=True)
+        except Exception as e:
+            print(f"Warning: could not reload skills_rules ({e!r}).")
+
+async def start_skill_rules_cache():
+    """Startup hook: compiles the rules and starts the change watcher."""
+    global _rules_watcher
+    await load_skill_rules()
+    if _rules_watcher is None:
+        _rules_watcher = asyncio.create_task(watch_skill_rules())
+
+async def stop_skill_rules_cache():
+    global _rules_watcher
+    if _rules_watcher is not None:
+        _rules_watcher.cancel()
+        _rules_watcher = None
+
 async def get_skill_tree(skill_name: str):
-    """Fetches the skill tree from MongoDB."""
-    doc = await skills_rules_collection.find_one({"name": skill_name})
-    if doc:
-        return doc["tree"]
+    """Returns the skill tree from the compiled cache."""
+    await ensure_skill_rules()
     
     # Fallback if not found (Empty Tree)
-    return []
+    return _skill_trees.get(skill_name, [])
+
+def get_skill_modifiers(skill_name: str, tier: int, choice_idx: int):
+    return _skill_modifiers.get((skill_name, tier, choice_idx), ())
 
 async def calculate_derived_stats(character: dict):
+    await ensure_skill_rules()
+    return compute_derived_stats(character)
+
+# --- Materialized Derived Stats ---
+# Characters carry a persisted "derived" block stamped with the rules version
+# it was computed from. Reads use it as-is while the version still matches.
+
+async def materialize_derived_stats(character: dict):
+    """Computes a derived block ready to be stored on the character document."""
+    await ensure_skill_rules()
+    derived = compute_derived_stats(character)
+    derived["rules_version"] = _rules_version
+    return derived
+
+def is_derived_current(character: dict):
+    derived = character.get("derived")
+    return bool(derived) and _rules_loaded and derived.get("rules_version") == _rules_version
+
+async def get_derived_stats(character: dict):
+    """The stored derived block if it is current, otherwise a fresh computation."""
+    await ensure_skill_rules()
+    if is_derived_current(character):
+        return character["derived"]
+    return compute_derived_stats(character)
+
+async def calculate_party_derived_stats(characters: list):
+    """
+    Derived stats for a whole party at once. Characters whose stored derived
+    block is current are served from it without computing anything, which is
+    what keeps a large party's dashboard cheap; the rest are computed from the
+    compiled rules cache.
+    """
+    await ensure_skill_rules()
+    return [char["derived"] if is_derived_current(char) else compute_derived_stats(char) for char in characters]
+
+def compute_derived_stats(character: dict):
+    """Pure derived-stats calculation. Expects the rules cache to be loaded."""
     stats = character.get("stats", {})
     equip = character.get("equipment", {})
     
@@ -121,46 +376,29 @@ async def calculate_derived_stats(character: dict):
     
     if horse: equipped_types.append("Horse")
 
-    # 3. SKILL MODIFIERS (Async Loop)
-    # Optimization: Fetch all needed trees in parallel or one by one. 
-    # For MVP, one by one is fine, but strictly we should optimize later.
-    
+    # 3. SKILL MODIFIERS (Compiled cache, no DB calls)
     for attr_name, attr_data in stats.items():
         for skill_name, skill_data in attr_data.get("skills", {}).items():
             unlocked_nodes = skill_data.get("nodes_unlocked", {})
             if not unlocked_nodes: continue
 
-            # AWAIT the DB call
-            tree_rules = await get_skill_tree(skill_name)
-
             for tier_str, choice_idx in unlocked_nodes.items():
-                tier = int(tier_str)
-                node_rule = next((n for n in tree_rules if n["tier"] == tier), None)
-                
-                if node_rule and 0 <= choice_idx < len(node_rule["choices"]):
-                    choice = node_rule["choices"][choice_idx]
-                    modifiers = choice.get("modifiers", [])
+                for stat, val, condition in get_skill_modifiers(skill_name, int(tier_str), choice_idx):
+                    apply = False
+                    
+                    if condition == "always": apply = True
+                    elif condition.startswith("equip:"):
+                        req_type = condition.split(":")[1]
+                        if req_type in equipped_types: apply = True
                     
-                    for mod in modifiers:
-                        condition = mod.get("condition", "always")
-                        apply = False
-                        
-                        if condition == "always": apply = True
-                        elif condition.startswith("equip:"):
-                            req_type = condition.split(":")[1]
-                            if req_type in equipped_types: apply = True
-                        
-                        if apply:
-                            val = mod["value"]
-                            stat = mod["stat"]
-                            
-                            if stat == "damage": total_damage += val
-                            if stat == "defense": total_defense += val
-                            if stat == "speed": base_speed_bonus += val # Add to MAX Speed
-                            if stat == "max_load": base_load += val
-                            if stat == "hp_max": bonus_hp += val
-                            if stat == "stamina": bonus_stamina += val
-                            if stat == "critical_damage": total_crit_bonus += val
+                    if apply:
+                        if stat == "damage": total_damage += val
+                        if stat == "defense": total_defense += val
+                        if stat == "speed": base_speed_bonus += val # Add to MAX Speed
+                        if stat == "max_load": base_load += val
+                        if stat == "hp_max": bonus_hp += val
+                        if stat == "stamina": bonus_stamina += val
+                        if stat == "critical_damage": total_crit_bonus += val
 
     # 4. FINAL CALCULATIONS
     max_load = base_load + horse_bonus
@@ -1,18 +1,42 @@
-from fastapi import FastAPI, Depends, Request
+from urllib.parse import urlsplit
+from fastapi import FastAPI, Depends, Request, status
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse
 from app.auth import routes as auth_routes
 from app.characters import routes as character_routes
 from app.campaigns import routes as campaign_routes
 from app.wiki import routes as wiki_routes
 from app.auth.dependencies import get_current_user
-from app.core.i18n import load_translations
-from app.templates import templates
+from app.core.i18n import load_translations, available_locales, match_locale, LocaleMiddleware, LOCALE_COOKIE
+from app.templates import templates, precompile_templates
 from app.config import settings
+from app.game_rules import start_skill_rules_cache, stop_skill_rules_cache
+from app.campaigns.combat import start_combat_engine, stop_combat_engine
+from app.core.indexes import ensure_indexes
+from app.wiki.links import backfill_link_graph
 
 app = FastAPI()
 
 load_translations(settings.LANGUAGE)
+# Each request renders in its own locale ('lang' cookie, then Accept-Language)
+app.add_middleware(LocaleMiddleware)
+
+@app.on_event("startup")
+async def startup():
+    if settings.PRODUCTION:
+        # Parse every template now instead of on each worker's first requests
+        precompile_templates()
+    await ensure_indexes()
+    await backfill_link_graph(wiki_routes.wiki_collection)
+    # Compile skill rules once so derived stats never query Mongo
+    await start_skill_rules_cache()
+    await start_combat_engine()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await stop_skill_rules_cache()
+    # Flush live combat sessions before the worker exits
+    await stop_combat_engine()
 
 # City Pins for World Map
 CITY_PINS = [
@@ -60,6 +84,19 @@ async def world_map(request: Request, user: dict = Depends(get_current_user)):
         },
     )
 
+@app.get("/lang/{locale}", include_in_schema=False)
+async def set_language(locale: str, request: Request):
+    lang = match_locale(locale, available_locales()) or settings.LANGUAGE
+    # Back to the page the switcher was clicked on, if it was one of ours
+    referer = urlsplit(request.headers.get("referer", ""))
+    back = "/"
+    same_host = referer.netloc == request.headers.get("host", request.url.netloc)
+    if same_host and referer.path.startswith("/") and not referer.path.startswith(("//", "/\\")):
+        back = referer.path + (f"?{referer.query}" if referer.query else "")
+    response = RedirectResponse(back, status_code=status.HTTP_303_SEE_OTHER)
+    response.set_cookie(key=LOCALE_COOKIE, value=lang, max_age=365 * 24 * 3600, samesite="lax")
+    return response
+
 @app.get("/favicon.ico", include_in_schema=False)
 async def favicon():
     return FileResponse("app/static/favicon.ico")
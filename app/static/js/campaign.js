@@ -1,11 +1,21 @@
 // DICE SIMULATOR LOGIC
 
-// 1. Database of Difficulty (Matches Python)
-const DIFF_LEVELS = {
-    1: 2, 2: 5, 3: 10, 4: 15, 5: 20
-};
+// 1. Odds table (DCs and success chances), computed once by the server
+let CHECK_TABLE = null;
+
+function loadCheckTable() {
+    if (CHECK_TABLE) return Promise.resolve(CHECK_TABLE);
+    return fetch('/rules/checks')
+        .then(resp => resp.ok ? resp.json() : null)
+        .then(table => { CHECK_TABLE = table; return table; });
+}
 
 function updateSimulator() {
+    if (!CHECK_TABLE) {
+        loadCheckTable().then(table => { if (table) updateSimulator(); });
+        return;
+    }
+
     // Get Inputs
     const actionSelect = document.getElementById('sim-action');
     const diffInput = document.getElementById('sim-difficulty');
@@ -48,19 +58,22 @@ function updateSimulator() {
         }
     }
 
-    // rest of simulator logic (no change)...
-    const baseDC = DIFF_LEVELS[diffLevel] || 10;
+    // rest of simulator logic: look the check up instead of recomputing the DC rules here
+    const level = CHECK_TABLE.difficulties[String(diffLevel)] || CHECK_TABLE.difficulties["3"];
     const baseDCDisplay = document.getElementById('display-base-dc');
-    if (baseDCDisplay) baseDCDisplay.innerText = baseDC;
+    if (baseDCDisplay) baseDCDisplay.innerText = level.base_dc;
 
-    const reduction = Math.floor(charAttr / 2);
+    const attrIdx = Math.min(Math.max(charAttr, 0), CHECK_TABLE.max_attribute);
+    const check = level.checks[attrIdx];
     const reductionDisplay = document.getElementById('display-reduction');
-    if (reductionDisplay) reductionDisplay.innerText = reduction;
+    if (reductionDisplay) reductionDisplay.innerText = level.base_dc - check.dc;
 
-    let finalDC = baseDC - reduction;
-    if (finalDC < 2) finalDC = 2;
+    const finalDC = check.dc;
     resultSpan.innerText = finalDC + "+";
 
+    const chanceSpan = document.getElementById('sim-chance');
+    if (chanceSpan) chanceSpan.innerText = Math.round(check.success * 100) + "%";
+
     if (finalDC <= 5) resultSpan.style.color = "green";
     else if (finalDC <= 10) resultSpan.style.color = "#c5a004";
     else if (finalDC <= 15) resultSpan.style.color = "orange";
@@ -144,4 +157,178 @@ function duplicateEnemySelect() {
     const container = document.getElementById('enemy-container');
     const select = container.querySelector('select').cloneNode(true);
     container.appendChild(select);
-}
\ No newline at end of file
+}
+// --- LIVE COMBAT (Server-Sent Events) ---
+// The server pushes only the combatant fields and log lines that changed;
+// combat forms are posted with fetch() so the page is never re-rendered.
+
+let combatState = null;
+
+function initCombatStream(campId) {
+    if (!window.EventSource) return;
+
+    const tracker = document.getElementById('combat-tracker');
+    const source = new EventSource(`/campaigns/${campId}/combat/stream`);
+
+    source.onmessage = function(msg) {
+        const event = JSON.parse(msg.data);
+
+        if (event.type === 'snapshot') {
+            // The first snapshot matches the server-rendered page (keep its translated log)
+            const isResync = combatState !== null;
+            combatState = event.combatants;
+            if (tracker) renderCombat(isResync ? event.log : null);
+            patchPartyPanel(Object.keys(combatState));
+        } else if (event.type === 'delta' && combatState) {
+            for (const [idx, fields] of Object.entries(event.combatants)) {
+                Object.assign(combatState[parseInt(idx)], fields);
+            }
+            renderCombat(null, event.log);
+            // Player HP/stamina reach the sheets later (write-behind), so patch the party panel from the delta
+            patchPartyPanel(Object.keys(event.combatants));
+        } else if (event.type === 'start' || (event.type === 'end' && tracker)) {
+            // Switching between setup and active mode: swap the tracker, then reconnect
+            source.close();
+            combatState = null;
+            Promise.all([refreshFragment(campId, 'combat'), refreshFragment(campId, 'party')])
+                .then(() => initCombatStream(campId));
+        }
+    };
+
+    if (tracker) {
+        tracker.querySelectorAll('form[data-combat-form]').forEach(form => {
+            form.addEventListener('submit', submitCombatForm);
+        });
+    }
+}
+
+async function submitCombatForm(event) {
+    event.preventDefault();
+    const form = event.target;
+    const data = new FormData(form);
+    if (event.submitter && event.submitter.name) data.append(event.submitter.name, event.submitter.value);
+
+    const resp = await fetch(form.action, {method: 'POST', body: data, headers: {'Accept': 'application/json'}});
+    if (resp.ok) {
+        form.reset();
+    } else {
+        const body = await resp.json().catch(() => ({}));
+        alert(body.error || resp.statusText);
+    }
+}
+
+function renderCombat(fullLog, newLogLine) {
+    const table = document.getElementById('combat-table');
+    if (!table || !combatState) return;
+
+    // 1. Rows: update values, then re-sort by action points (same as the server template)
+    const rows = [];
+    combatState.forEach((c, idx) => {
+        const row = table.querySelector(`tr[data-idx="${idx}"]`);
+        if (!row) return;
+        const down = c.hp_current <= 0;
+        row.querySelector('.c-name').innerText = c.name + (down ? ' 💀' : '');
+        const hp = row.querySelector('.c-hp');
+        hp.innerText = c.hp_current;
+        hp.style.color = c.hp_current === 0 ? 'red' : 'black';
+        row.querySelector('.c-stam').innerText = c.stamina_current;
+        row.querySelector('.c-bar').style.width = Math.min(c.action_points, 100) + '%';
+        row.querySelector('.c-ap').innerText = Math.trunc(c.action_points);
+        row.style.opacity = down ? '0.5' : '1';
+        row.style.fontWeight = '';
+        row.style.border = '';
+        rows.push({row, c, idx});
+    });
+    rows.sort((a, b) => (b.c.action_points - a.c.action_points) || (a.idx - b.idx));
+    rows.forEach(r => r.row.parentNode.appendChild(r.row));
+
+    const top = rows[0];
+    const isReady = top && top.c.action_points >= 100 && top.c.hp_current > 0;
+    if (isReady) {
+        top.row.style.fontWeight = 'bold';
+        top.row.style.border = '2px solid #8a3324';
+    }
+
+    // 2. Controls
+    document.getElementById('combat-next').style.display = isReady ? 'none' : '';
+    document.getElementById('combat-waiting').style.display = isReady ? 'none' : '';
+    document.getElementById('combat-ready').style.display = isReady ? '' : 'none';
+
+    if (isReady) {
+        const actorInput = document.querySelector('#combat-ready input[name="actor_index"]');
+        if (actorInput.value !== String(top.idx)) {
+            // Ammo is only known for the actor the page was rendered with
+            const ammo = document.getElementById('combat-ammo');
+            if (ammo) ammo.style.display = 'none';
+            const attackBtn = document.querySelector('#combat-ready button[value="Attack"]');
+            if (attackBtn) attackBtn.disabled = false;
+        }
+        actorInput.value = top.idx;
+        const turn = document.getElementById('combat-turn');
+        turn.innerText = turn.getAttribute('data-template').replace('{name}', top.c.name);
+
+        const select = document.querySelector('#combat-ready select[name="target_index"]');
+        const placeholder = select.options[0];
+        select.innerHTML = '';
+        select.appendChild(placeholder);
+        placeholder.selected = true;
+        combatState.forEach((c, idx) => {
+            if (c.hp_current <= 0) return;
+            const opt = document.createElement('option');
+            opt.value = idx;
+            opt.innerText = `${c.name} (HP: ${c.hp_current})`;
+            select.appendChild(opt);
+        });
+    }
+
+    // 3. Log
+    const logBox = document.getElementById('combat-log');
+    const logText = entry => (typeof entry === 'string') ? entry : (entry.key || '');
+    if (fullLog) {
+        logBox.innerHTML = '';
+        fullLog.forEach(entry => logBox.appendChild(makeLogLine(logText(entry))));
+    } else if (newLogLine) {
+        logBox.insertBefore(makeLogLine(logText(newLogLine)), logBox.firstChild);
+        while (logBox.children.length > 10) logBox.removeChild(logBox.lastChild);
+    }
+}
+
+function patchPartyPanel(indexes) {
+    for (const idx of indexes) {
+        const c = combatState[parseInt(idx)];
+        if (!c || c.type !== 'Player') continue;
+        const row = document.querySelector(`#fragment-party tr[data-char-id="${c.id}"]`);
+        if (!row) continue;
+        const hp = row.querySelector('.p-hp');
+        hp.innerText = c.hp_current;
+        hp.style.color = c.hp_current < 5 ? 'red' : 'inherit';
+        row.querySelector('.p-stam').innerText = c.stamina_current;
+    }
+}
+
+function makeLogLine(text) {
+    const div = document.createElement('div');
+    div.style.borderBottom = '1px solid #eee';
+    div.innerText = text;
+    return div;
+}
+
+// --- DASHBOARD FRAGMENTS ---
+// Re-render a single dashboard section (combat, party, bestiary, map) in place.
+// The server answers 304 when the section's ETag is unchanged.
+
+const fragmentETags = {};
+
+async function refreshFragment(campId, name) {
+    const target = document.getElementById(`fragment-${name}`);
+    if (!target) return;
+
+    const headers = {};
+    if (fragmentETags[name]) headers['If-None-Match'] = fragmentETags[name];
+
+    const resp = await fetch(`/campaigns/${campId}/fragments/${name}`, {headers: headers, cache: 'no-store'});
+    if (resp.status === 304 || !resp.ok) return;
+
+    fragmentETags[name] = resp.headers.get('ETag');
+    target.innerHTML = await resp.text();
+}
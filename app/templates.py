@@ -1,13 +1,94 @@
+import os
+import time
 from fastapi.templating import Jinja2Templates
-from app.core.i18n import trans, trans_with_params
+from jinja2 import FileSystemBytecodeCache
+from jinja2.ext import Extension
+from jinja2.lexer import Token
+from app.config import settings
+from app.core.i18n import trans, trans_with_params, translate, get_locale, available_locales, catalog_version
+
+# --- COMPILE-TIME TRANSLATION ---
+# {{ 'Literal' | trans }} can only ever produce one string per locale, so each
+# locale gets its own overlay environment whose lexer swaps those tokens for the
+# translated literal. Templates are then compiled (and cached) once per locale;
+# only dynamic keys ({{ status | trans }}) still call the filter at render time.
+class LiteralTransExtension(Extension):
+    def filter_stream(self, stream):
+        lang = getattr(self.environment, "i18n_locale", None)
+        if lang is None: return stream
+
+        tokens = list(stream)
+        out, i = [], 0
+        while i < len(tokens):
+            token = tokens[i]
+            if (token.type == "string"
+                    and i + 2 < len(tokens) and tokens[i + 1].type == "pipe"
+                    and tokens[i + 2].type == "name" and tokens[i + 2].value == "trans"
+                    and not (i + 3 < len(tokens) and tokens[i + 3].type == "lparen")
+                    and not (i > 0 and tokens[i - 1].type == "string")):  # 'a' 'b' concatenates first
+                out.append(Token(token.lineno, "string", translate(token.value, lang)))
+                i += 3
+                continue
+            out.append(token)
+            i += 1
+        return iter(out)
+
+class LocalizedTemplates(Jinja2Templates):
+    """Jinja2Templates that serves each request from its locale's environment."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._locale_envs = {}
+
+    def env_for(self, lang: str):
+        env = self._locale_envs.get(lang)
+        if env is None:
+            # Overlays share loader, filters and globals but keep their own template cache
+            env = self.env.overlay(extensions=[LiteralTransExtension])
+            env.i18n_locale = lang
+            if settings.PRODUCTION:
+                # Compiled code differs per locale and per catalog, and Jinja's bytecode
+                # key only covers the template source, so both go in the file name
+                env.bytecode_cache = FileSystemBytecodeCache(
+                    settings.TEMPLATE_CACHE_DIR, f"__jinja2_{lang}_{catalog_version(lang)}_%s.cache"
+                )
+            self._locale_envs[lang] = env
+        return env
+
+    def get_template(self, name: str):
+        return self.env_for(get_locale()).get_template(name)
+
+    def precompile(self):
+        """Loads every template for every locale so no request pays for parsing. Returns the count."""
+        count = 0
+        for lang in available_locales():
+            env = self.env_for(lang)
+            for name in env.list_templates(extensions=["html"]):
+                env.get_template(name)
+                count += 1
+        return count
 
 # Create a single instance
-templates = Jinja2Templates(directory="app/templates")
+templates = LocalizedTemplates(directory="app/templates")
+
+# --- PRODUCTION MODE ---
+# Templates never change under a running deploy: skip the per-render mtime
+# checks and keep compiled bytecode on disk across restarts.
+if settings.PRODUCTION:
+    os.makedirs(settings.TEMPLATE_CACHE_DIR, exist_ok=True)
+    templates.env.auto_reload = False
+
+def precompile_templates():
+    started = time.perf_counter()
+    count = templates.precompile()
+    print(f"Precompiled {count} templates in {(time.perf_counter() - started) * 1000:.0f} ms.")
 
 # Register the filters globally
 templates.env.filters["trans"] = trans
 # transp: translate with params dict
 templates.env.filters["transp"] = lambda key, params={}: trans_with_params(key, params)
+# Per-request locale (set by LocaleMiddleware) for the language switcher
+templates.env.globals["get_locale"] = get_locale
+templates.env.globals["available_locales"] = available_locales
 
 
 def int_to_roman(num: int) -> str:
@@ -20,7 +20,7 @@ async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends
     # Find user by email
     user = await users_collection.find_one({"email": form_data.username})
     
-    if not user or not verify_password(form_data.password, user["password_hash"]):
+    if not user or not await verify_password(form_data.password, user["password_hash"]):
         # Return login page with error message
         return templates.TemplateResponse("login.html", {
             "request": request, 
@@ -51,7 +51,7 @@ async def register(user_data: UserCreate):
     # Hash password and save
     new_user = UserInDB(
         email=user_data.email,
-        password_hash=get_password_hash(user_data.password)
+        password_hash=await get_password_hash(user_data.password)
     )
     
     await users_collection.insert_one(new_user.model_dump(by_alias=True, exclude={"id"}))
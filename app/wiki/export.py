@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import shutil
+import sys
+
+from app.config import settings
+from app.core.i18n import load_translations
+from app.templates import templates
+from app.wiki.render_cache import page_stamp
+from app.wiki.routes import wiki_collection, build_wiki_library, render_article
+
+# --- STATIC WIKI EXPORT ---
+# Writes the player-facing wiki (index + every page, rendered as a non-GM
+# reader sees it) to a directory that any static server or CDN can serve:
+#
+#   out/wiki/index.html            -> /wiki
+#   out/wiki/<page_id>/index.html  -> /wiki/<page_id>
+#   out/static/...                 -> /static/...
+#
+# Text files get a .gz sibling for gzip_static-style serving. A manifest of
+# page stamps makes reruns incremental: only pages whose updated_at (or link
+# targets) changed are rendered again, and deleted pages are removed.
+#
+#   python -m app.wiki.export --out dist/wiki [--full]
+
+MANIFEST = ".export-manifest.json"
+COMPRESSIBLE = (".html", ".css", ".js", ".json", ".svg", ".txt")
+STATIC_DIR = "app/static"
+
+class StaticRequest:
+    """Stands in for the Request that base.html reads (alerts from ?error=)."""
+    query_params = {}
+
+def write_file(path: str, content: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(content)
+    os.replace(tmp, path)
+    if path.endswith(COMPRESSIBLE):
+        # mtime=0 keeps the .gz byte-identical across reruns
+        write_gz(path + ".gz", gzip.compress(content, compresslevel=9, mtime=0))
+
+def write_gz(path: str, data: bytes):
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+def load_manifest(out: str):
+    try:
+        with open(os.path.join(out, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def copy_static(out: str):
+    """Copies app/static, skipping files that are already up to date. Returns how many were copied."""
+    copied = 0
+    for root, _, files in os.walk(STATIC_DIR):
+        for name in files:
+            src = os.path.join(root, name)
+            dst = os.path.join(out, "static", os.path.relpath(src, STATIC_DIR))
+            if os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src): continue
+            with open(src, "rb") as f:
+                write_file(dst, f.read())
+            copied += 1
+    return copied
+
+async def export_wiki(out: str, full: bool = False):
+    previous = {} if full else load_manifest(out)
+    manifest, rendered = {}, 0
+    context = {"request": StaticRequest(), "user": None, "static_export": True}
+
+    async for stub in wiki_collection.find({}, {"updated_at": 1, "created_at": 1, "links_updated_at": 1}):
+        page_id = str(stub["_id"])
+        stamp = str(page_stamp(stub))
+        manifest[page_id] = stamp
+        if previous.get(page_id) == stamp and os.path.exists(os.path.join(out, "wiki", page_id, "index.html")): continue
+
+        page = await wiki_collection.find_one({"_id": stub["_id"]})
+        if not page: continue
+        article_html = await render_article(page)
+        html = templates.get_template("wiki_page.html").render(page=page, article_html=article_html, **context)
+        write_file(os.path.join(out, "wiki", page_id, "index.html"), html.encode("utf-8"))
+        rendered += 1
+
+    removed = [page_id for page_id in previous if page_id not in manifest]
+    for page_id in removed:
+        shutil.rmtree(os.path.join(out, "wiki", page_id), ignore_errors=True)
+
+    # The index tree is one cheap aggregation; rebuild it whenever anything changed
+    index_path = os.path.join(out, "wiki", "index.html")
+    if rendered or removed or not os.path.exists(index_path):
+        library = await build_wiki_library()
+        html = templates.get_template("wiki_index.html").render(library=library, **context)
+        write_file(index_path, html.encode("utf-8"))
+
+    copied = copy_static(out)
+    with open(os.path.join(out, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    return {"pages": len(manifest), "rendered": rendered, "removed": len(removed), "static_files": copied}
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the wiki as static, precompressed HTML.")
+    parser.add_argument("--out", default="dist/wiki", help="Output directory")
+    parser.add_argument("--full", action="store_true", help="Ignore the manifest and re-render every page")
+    args = parser.parse_args()
+
+    load_translations(settings.LANGUAGE)
+    stats = asyncio.run(export_wiki(args.out, args.full))
+    print(f"Exported {stats['rendered']}/{stats['pages']} pages ({stats['removed']} removed, {stats['static_files']} static files) to {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
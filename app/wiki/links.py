@@ -0,0 +1,68 @@
+import re
+from datetime import datetime
+
+# --- CROSS-LINKS ---
+# Content links to other pages as [[Page Title]] or [[Page Title|label]].
+# Each page stores its normalized `title_key` and the keys it links to
+# (`links`), so both directions of the graph are single indexed queries:
+# resolving a page's links is a title_key $in, its backlinks are links == key.
+
+LINK_RE = re.compile(r"\[\[([^\[\]|]+)(?:\|([^\[\]]+))?\]\]")
+
+def title_key(title: str):
+    return " ".join((title or "").split()).casefold()
+
+def extract_links(content: str):
+    return sorted({title_key(m.group(1)) for m in LINK_RE.finditer(content or "")} - {""})
+
+def link_fields(title: str, content: str):
+    """The graph fields stored on a wiki document."""
+    return {"title_key": title_key(title), "links": extract_links(content)}
+
+async def resolve_links(collection, content: str):
+    """
+    Splits content into segments for the template:
+    {"text": ...} for plain text, {"text": ..., "link": True, "url": ...} for links.
+    A link whose page does not exist has url None.
+    """
+    keys = extract_links(content)
+    targets = {}
+    if keys:
+        async for doc in collection.find({"title_key": {"$in": keys}}, {"title_key": 1}):
+            targets.setdefault(doc["title_key"], f"/wiki/{doc['_id']}")
+
+    segments, pos = [], 0
+    for m in LINK_RE.finditer(content or ""):
+        if m.start() > pos: segments.append({"text": content[pos:m.start()]})
+        target = m.group(1).strip()
+        segments.append({"text": (m.group(2) or target).strip(), "link": True, "target": target, "url": targets.get(title_key(target))})
+        pos = m.end()
+    if pos < len(content or ""): segments.append({"text": content[pos:]})
+    return segments
+
+async def find_backlinks(collection, page: dict):
+    key = page.get("title_key") or title_key(page.get("title"))
+    return await collection.find(
+        {"links": key, "_id": {"$ne": page["_id"]}}, {"title": 1}
+    ).sort("title", 1).to_list(None)
+
+async def touch_linked_pages(collection, title_keys, link_keys):
+    """
+    After a page is created, edited or deleted, marks the pages whose rendering
+    changed: pages linking to its (old or new) title, and pages it started or
+    stopped linking to. Returns their ids so cached renderings can be dropped.
+    """
+    clauses = []
+    if title_keys: clauses.append({"links": {"$in": list(title_keys)}})
+    if link_keys: clauses.append({"title_key": {"$in": list(link_keys)}})
+    if not clauses: return []
+
+    ids = [doc["_id"] async for doc in collection.find({"$or": clauses}, {"_id": 1})]
+    if ids:
+        await collection.update_many({"_id": {"$in": ids}}, {"$set": {"links_updated_at": datetime.utcnow()}})
+    return [str(i) for i in ids]
+
+async def backfill_link_graph(collection):
+    """Startup: adds graph fields to pages written before cross-links existed."""
+    async for doc in collection.find({"title_key": {"$exists": False}}, {"title": 1, "content": 1}):
+        await collection.update_one({"_id": doc["_id"]}, {"$set": link_fields(doc.get("title"), doc.get("content"))})
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, BeforeValidator
-from typing import Optional, Annotated
+from typing import List, Optional, Annotated
 from datetime import datetime
 from bson import ObjectId
 
@@ -14,6 +14,12 @@ class WikiPage(BaseModel):
     subcategory: str = "General"        # Second level (e.g. "Combat")
     
     content: str
+    revision: int = 0                   # Latest entry in wiki_revisions
+
+    # Link graph (see app/wiki/links.py)
+    title_key: str = ""
+    links: List[str] = []
+    links_updated_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
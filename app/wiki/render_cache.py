@@ -0,0 +1,95 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from email.utils import format_datetime
+from datetime import timezone
+
+from app.config import settings
+from app.core.i18n import get_locale
+
+# --- RENDERED PAGE CACHE ---
+# Wiki articles are rendered once per (page, updated_at, role) and reused until
+# the page changes. Backends share one interface: get/set by (page_id, variant)
+# and invalidate(page_id). "memory" is a per-worker LRU; "disk" is shared by
+# every worker on the host.
+
+class MemoryRenderCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def get(self, page_id: str, variant: str):
+        key = (page_id, variant)
+        html = self._entries.get(key)
+        if html is not None: self._entries.move_to_end(key)
+        return html
+
+    def set(self, page_id: str, variant: str, html: str):
+        self._entries[(page_id, variant)] = html
+        self._entries.move_to_end((page_id, variant))
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, page_id: str):
+        for key in [k for k in self._entries if k[0] == page_id]:
+            del self._entries[key]
+
+class DiskRenderCache:
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, page_id: str, variant: str = None):
+        page_dir = os.path.join(self.directory, page_id)
+        return os.path.join(page_dir, f"{variant}.html") if variant else page_dir
+
+    def get(self, page_id: str, variant: str):
+        try:
+            with open(self._path(page_id, variant), encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, page_id: str, variant: str, html: str):
+        page_dir = self._path(page_id)
+        try:
+            os.makedirs(page_dir, exist_ok=True)
+            # Write then rename so other workers never read half a file
+            fd, tmp = tempfile.mkstemp(dir=page_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(html)
+            os.replace(tmp, self._path(page_id, variant))
+        except OSError as e:
+            print(f"Warning: could not cache wiki page {page_id} ({e}).")
+
+    def invalidate(self, page_id: str):
+        shutil.rmtree(self._path(page_id), ignore_errors=True)
+
+def make_render_cache():
+    if settings.WIKI_CACHE_BACKEND == "disk":
+        return DiskRenderCache(settings.WIKI_CACHE_DIR)
+    return MemoryRenderCache(settings.WIKI_CACHE_SIZE)
+
+render_cache = make_render_cache()
+
+# --- CONDITIONAL GET ---
+def page_stamp(page: dict):
+    """When the rendered page last changed: its own edit or a change in what it links to."""
+    stamps = [page.get(f) for f in ("updated_at", "created_at", "links_updated_at") if page.get(f)]
+    return max(stamps) if stamps else None
+
+def page_variant(page: dict, role: str):
+    """Cache key for one rendering of a page: its version plus what the template varies on."""
+    stamp = page_stamp(page)
+    return hashlib.sha1(f"{stamp}|{role}|{get_locale()}".encode("utf-8")).hexdigest()[:16]
+
+def page_etag(variant: str, user: dict, query: str = ""):
+    # base.html shows who is logged in and ?error= alerts, so the validator covers those too
+    payload = f"{variant}|{user.get('sub')}|{query}"
+    return f'W/"{hashlib.sha1(payload.encode("utf-8")).hexdigest()}"'
+
+def last_modified(page: dict):
+    stamp = page_stamp(page)
+    if not stamp: return None
+    return format_datetime(stamp.replace(tzinfo=timezone.utc), usegmt=True)
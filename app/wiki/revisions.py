@@ -0,0 +1,83 @@
+import difflib
+import json
+import zlib
+from datetime import datetime
+
+from app.database import db
+
+wiki_revisions_collection = db["wiki_revisions"]
+
+# --- REVISION HISTORY ---
+# Every save of a page is a numbered revision in `wiki_revisions`. Revision 0 and
+# every SNAPSHOT_EVERY-th revision store the full text; the rest store a
+# compressed delta against the previous revision. Rebuilding any revision
+# replays at most SNAPSHOT_EVERY - 1 deltas on top of a snapshot.
+SNAPSHOT_EVERY = 20
+
+def encode_delta(old: str, new: str):
+    """Line ops that turn `old` into `new`: [start, end] copies old lines, a string is inserted text."""
+    old_lines, new_lines = old.splitlines(keepends=True), new.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_opcodes():
+        if tag == "equal": ops.append([i1, i2])
+        elif tag in ("replace", "insert"): ops.append("".join(new_lines[j1:j2]))
+    return zlib.compress(json.dumps(ops, separators=(",", ":")).encode("utf-8"))
+
+def apply_delta(old: str, data: bytes):
+    old_lines = old.splitlines(keepends=True)
+    ops = json.loads(zlib.decompress(data))
+    return "".join("".join(old_lines[op[0]:op[1]]) if isinstance(op, list) else op for op in ops)
+
+def encode_snapshot(text: str):
+    return zlib.compress(text.encode("utf-8"))
+
+def decode_snapshot(data: bytes):
+    return zlib.decompress(data).decode("utf-8")
+
+async def record_revision(page: dict, rev: int, previous_content: str = None, author: str = None):
+    """Stores revision `rev` of a page. `previous_content` is the text of revision rev - 1."""
+    is_snapshot = rev % SNAPSHOT_EVERY == 0 or previous_content is None
+    await wiki_revisions_collection.insert_one({
+        "page_id": str(page["_id"]),
+        "rev": rev,
+        "kind": "snapshot" if is_snapshot else "delta",
+        "data": encode_snapshot(page["content"]) if is_snapshot else encode_delta(previous_content, page["content"]),
+        "title": page["title"],
+        "author": author,
+        "created_at": datetime.utcnow(),
+    })
+
+async def load_revision(page_id: str, rev: int):
+    """Full text of one revision, or None if it does not exist."""
+    base = await wiki_revisions_collection.find_one(
+        {"page_id": page_id, "rev": {"$lte": rev}, "kind": "snapshot"},
+        sort=[("rev", -1)]
+    )
+    if not base: return None
+
+    text = decode_snapshot(base["data"])
+    cursor = wiki_revisions_collection.find(
+        {"page_id": page_id, "rev": {"$gt": base["rev"], "$lte": rev}}, {"rev": 1, "kind": 1, "data": 1}
+    ).sort("rev", 1)
+    last = base["rev"]
+    async for entry in cursor:
+        text = decode_snapshot(entry["data"]) if entry["kind"] == "snapshot" else apply_delta(text, entry["data"])
+        last = entry["rev"]
+    return text if last == rev else None
+
+async def list_revisions(page_id: str):
+    return await wiki_revisions_collection.find(
+        {"page_id": page_id}, {"rev": 1, "kind": 1, "title": 1, "author": 1, "created_at": 1}
+    ).sort("rev", -1).to_list(None)
+
+async def delete_revisions(page_id: str):
+    await wiki_revisions_collection.delete_many({"page_id": page_id})
+
+def diff_lines(old: str, new: str):
+    """Unified diff of two revisions as (kind, line) pairs for the template."""
+    lines = []
+    for line in difflib.unified_diff(old.splitlines(), new.splitlines(), lineterm="", n=2):
+        if line.startswith(("---", "+++")): continue
+        kind = {"+": "add", "-": "del", "@": "hunk"}.get(line[:1], "same")
+        lines.append((kind, line))
+    return lines
@@ -1,35 +1,77 @@
+import asyncio
 from fastapi import APIRouter, Depends, Request, Form, status, HTTPException
-from fastapi.responses import RedirectResponse, HTMLResponse
+from fastapi.responses import RedirectResponse, HTMLResponse, Response
 from app.templates import templates
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime
 
 from app.database import db
 from app.auth.dependencies import get_current_user
 from app.wiki.models import WikiPage
+from app.wiki.revisions import record_revision, load_revision, list_revisions, delete_revisions, diff_lines
+from app.wiki.links import link_fields, resolve_links, find_backlinks, touch_linked_pages
+from app.wiki.render_cache import render_cache, page_variant, page_etag, last_modified
+from app.wiki.search import get_search_index, index_page, unindex_page
+from app.wiki.version import bump_wiki_version, current_wiki_version
 
 router = APIRouter()
 wiki_collection = db["wiki"]
 
 # --- 1. INDEX (Nested Grouping) ---
+# The group -> subcategory -> pages tree is built by Mongo from titles only and
+# kept in process until a page is created, edited or deleted, here or (seen
+# through the wiki version stamp) on another worker.
+_library = None
+_library_version = None
+
+INDEX_PIPELINE = [
+    {"$project": {
+        "title": 1,
+        "group": {"$ifNull": ["$group", "Uncategorized"]},
+        "subcategory": {"$ifNull": ["$subcategory", {"$ifNull": ["$category", "General"]}]},
+    }},
+    {"$sort": {"title": 1}},
+    {"$group": {
+        "_id": {"group": "$group", "subcategory": "$subcategory"},
+        "pages": {"$push": {"_id": "$_id", "title": "$title"}},
+    }},
+    {"$sort": {"_id.group": 1}},
+]
+
+async def build_wiki_library():
+    library = {}
+    async for bucket in wiki_collection.aggregate(INDEX_PIPELINE):
+        key = bucket["_id"]
+        library.setdefault(key["group"], {})[key["subcategory"]] = bucket["pages"]
+    return library
+
+async def get_wiki_library():
+    global _library, _library_version
+    version = await current_wiki_version()
+    if _library is None or _library_version != version:
+        _library, _library_version = await build_wiki_library(), version
+    return _library
+
+def invalidate_wiki_library():
+    global _library
+    _library = None
+
 @router.get("/wiki", response_class=HTMLResponse)
 async def wiki_index(request: Request, user: dict = Depends(get_current_user)):
     if not user: return RedirectResponse("/auth/login", 303)
     
-    pages = await wiki_collection.find().sort("title", 1).to_list(1000)
-    library = {}
-    
-    for page in pages:
-        grp = page.get("group", "Uncategorized")
-        sub = page.get("subcategory", page.get("category", "General"))
-        if grp not in library: library[grp] = {}
-        if sub not in library[grp]: library[grp][sub] = []
-        library[grp][sub].append(page)
-        
+    library = await get_wiki_library()
     return templates.TemplateResponse("wiki_index.html", {
-        "request": request, "user": user, "library": dict(sorted(library.items()))
+        "request": request, "user": user, "library": library
     })
 
+# --- LINK GRAPH ---
+async def refresh_link_graph(title_keys: set, link_keys: set):
+    """Re-stamps and un-caches pages whose links or backlinks changed after a save."""
+    for touched_id in await touch_linked_pages(wiki_collection, title_keys, link_keys):
+        render_cache.invalidate(touched_id)
+
 # --- 2. CREATE PAGE ---
 @router.get("/wiki/new", response_class=HTMLResponse)
 async def new_page_form(request: Request, user: dict = Depends(get_current_user)):
@@ -45,20 +87,68 @@ async def create_page(
     if not user: return RedirectResponse("/auth/login", 303)
     if user["role"] != "GM": return RedirectResponse("/wiki", 303)
     
-    new_page = WikiPage(title=title, group=group, subcategory=subcategory, content=content)
-    await wiki_collection.insert_one(new_page.model_dump(by_alias=True, exclude={"id"}))
+    new_page = WikiPage(title=title, group=group, subcategory=subcategory, content=content, **link_fields(title, content))
+    doc = new_page.model_dump(by_alias=True, exclude={"id"})
+    result = await wiki_collection.insert_one(doc)
+    doc["_id"] = result.inserted_id
+    await record_revision(doc, 0, author=user["sub"])
+    await refresh_link_graph({doc["title_key"]}, set(doc["links"]))
+    invalidate_wiki_library()
+    index_page(doc, await bump_wiki_version(doc["_id"]))
     return RedirectResponse("/wiki", 303)
 
+# --- SEARCH (Declared before /wiki/{page_id} so "search" is not taken for an id) ---
+@router.get("/wiki/search", response_class=HTMLResponse)
+async def search_wiki(request: Request, q: str = "", user: dict = Depends(get_current_user)):
+    if not user: return RedirectResponse("/auth/login", 303)
+
+    index = await get_search_index(wiki_collection)
+    results = index.search(q) if q.strip() else []
+    return templates.TemplateResponse("wiki_search.html", {
+        "request": request, "user": user, "query": q, "results": results
+    })
+
 # --- 3. VIEW PAGE ---
+async def render_article(page: dict, user: dict = None):
+    """The article body (partials/wiki_article.html) with links resolved. Shared with the static export."""
+    segments, backlinks = await asyncio.gather(
+        resolve_links(wiki_collection, page.get("content", "")), find_backlinks(wiki_collection, page)
+    )
+    return templates.get_template("partials/wiki_article.html").render(
+        page=page, user=user, segments=segments, backlinks=backlinks
+    )
+
 @router.get("/wiki/{page_id}", response_class=HTMLResponse)
 async def view_page(page_id: str, request: Request, user: dict = Depends(get_current_user)):
     if not user: return RedirectResponse("/auth/login", 303)
     if not ObjectId.is_valid(page_id): raise HTTPException(404)
     
-    page = await wiki_collection.find_one({"_id": ObjectId(page_id)})
+    # Only the version stamps first: repeat readers get a 304 without the body being read
+    page = await wiki_collection.find_one({"_id": ObjectId(page_id)}, {"title": 1, "updated_at": 1, "created_at": 1, "links_updated_at": 1})
     if not page: raise HTTPException(404)
-    
-    return templates.TemplateResponse("wiki_page.html", {"request": request, "user": user, "page": page})
+
+    variant = page_variant(page, user["role"])
+    headers = {"ETag": page_etag(variant, user, request.url.query), "Cache-Control": "private, no-cache", "Vary": "Cookie"}
+    modified = last_modified(page)
+    if modified: headers["Last-Modified"] = modified
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if headers["ETag"] in if_none_match:
+            return Response(status_code=304, headers=headers)
+    elif modified and request.headers.get("if-modified-since") == modified:
+        return Response(status_code=304, headers=headers)
+
+    article_html = render_cache.get(page_id, variant)
+    if article_html is None:
+        page = await wiki_collection.find_one({"_id": ObjectId(page_id)})
+        if not page: raise HTTPException(404)
+        article_html = await render_article(page, user)
+        render_cache.set(page_id, variant, article_html)
+
+    return templates.TemplateResponse("wiki_page.html", {
+        "request": request, "user": user, "page": page, "article_html": article_html
+    }, headers=headers)
 
 # --- 4. EDIT PAGE ---
 @router.get("/wiki/{page_id}/edit", response_class=HTMLResponse)
@@ -77,17 +167,75 @@ async def update_page(
     if not user: return RedirectResponse("/auth/login", 303)
     if user["role"] != "GM": return RedirectResponse("/wiki", 303)
     
-    await wiki_collection.update_one(
+    # The old text is the base of the new revision's delta
+    now = datetime.utcnow()
+    before = await wiki_collection.find_one_and_update(
         {"_id": ObjectId(page_id)},
-        {"$set": {"title": title, "group": group, "subcategory": subcategory, "content": content, "updated_at": datetime.utcnow()}}
+        {"$set": {"title": title, "group": group, "subcategory": subcategory, "content": content,
+                  "updated_at": now, **link_fields(title, content)},
+         "$inc": {"revision": 1}},
+        return_document=ReturnDocument.BEFORE
     )
+    if not before: raise HTTPException(404)
+
+    page = {"_id": page_id, "title": title, "group": group, "subcategory": subcategory, "content": content, "updated_at": now}
+    previous_rev = before.get("revision")
+    if previous_rev is None:
+        # Page predates revision history: keep its old text as revision 0
+        previous_rev = 0
+        await record_revision(before, 0)
+    await record_revision(page, previous_rev + 1, before.get("content", ""), user["sub"])
+
+    # Linkers of a renamed page flip between resolved/broken; added or removed targets change their backlinks,
+    # and after a rename every target still linked lists this page under its new title
+    old_links = link_fields(before.get("title"), before.get("content"))
+    new_links = link_fields(title, content)
+    renamed = {old_links["title_key"], new_links["title_key"]} if old_links["title_key"] != new_links["title_key"] else set()
+    targets = set(old_links["links"]) ^ set(new_links["links"])
+    if renamed: targets |= set(new_links["links"])
+    await refresh_link_graph(renamed, targets)
+
+    invalidate_wiki_library()
+    render_cache.invalidate(page_id)
+    index_page(page, await bump_wiki_version(page_id))
     return RedirectResponse(f"/wiki/{page_id}", 303)
 
+# --- HISTORY (Revision list + diff between two revisions) ---
+@router.get("/wiki/{page_id}/history", response_class=HTMLResponse)
+async def page_history(page_id: str, request: Request, a: int = None, b: int = None, user: dict = Depends(get_current_user)):
+    if not user: return RedirectResponse("/auth/login", 303)
+    if user["role"] != "GM": return RedirectResponse(f"/wiki/{page_id}", 303)
+    if not ObjectId.is_valid(page_id): raise HTTPException(404)
+
+    page = await wiki_collection.find_one({"_id": ObjectId(page_id)}, {"title": 1})
+    if not page: raise HTTPException(404)
+    revisions = await list_revisions(page_id)
+
+    # Default view: the latest edit against the revision before it
+    diff = None
+    if revisions:
+        b = revisions[0]["rev"] if b is None else b
+        a = max(b - 1, 0) if a is None else a
+        old_text, new_text = await asyncio.gather(load_revision(page_id, a), load_revision(page_id, b))
+        if old_text is not None and new_text is not None:
+            diff = diff_lines(old_text, new_text)
+
+    return templates.TemplateResponse("wiki_history.html", {
+        "request": request, "user": user, "page": page, "revisions": revisions, "a": a, "b": b, "diff": diff
+    })
+
 # --- 5. DELETE PAGE ---
 @router.post("/wiki/{page_id}/delete")
 async def delete_page(page_id: str, user: dict = Depends(get_current_user)):
     if not user: return RedirectResponse("/auth/login", 303)
     if user["role"] != "GM": return RedirectResponse("/wiki", 303)
     
-    await wiki_collection.delete_one({"_id": ObjectId(page_id)})
+    page = await wiki_collection.find_one_and_delete({"_id": ObjectId(page_id)}, projection={"title": 1, "content": 1})
+    await delete_revisions(page_id)
+    if page:
+        graph = link_fields(page.get("title"), page.get("content"))
+        await refresh_link_graph({graph["title_key"]}, set(graph["links"]))
+    invalidate_wiki_library()
+    unindex_page(page_id, await bump_wiki_version(page_id, deleted=True))
+    render_cache.invalidate(page_id)
     return RedirectResponse("/wiki", 303)
\ No newline at end of file
@@ -0,0 +1,303 @@
+import asyncio
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+
+from bson import ObjectId
+
+from app.wiki.version import current_wiki_version, wiki_changes_since
+
+# --- WIKI SEARCH (In-process inverted index) ---
+# term -> {page_id: weighted term frequency}, ranked with BM25. Title and
+# category hits weigh more than body hits. The last query term also matches
+# longer words that start with it ("cav" finds "cavalry"), at a discount,
+# limited to the MAX_EXPANSIONS most common of those words.
+#
+# Queries start from the rarest term: its pages are the candidates, and the
+# other terms are only looked up for those pages. A common word contributes
+# just its IMPACT_DEPTH best-scoring pages (kept per word until a page with
+# that word changes), and at most MAX_CANDIDATES pages go on to the other terms, so
+# queries made only of very common words are ranked approximately.
+# Built from Mongo on the first search, then kept current by the wiki routes.
+
+TOKEN_RE = re.compile(r"\w+")
+COMBINING_RE = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]")
+FIELD_WEIGHTS = {"title": 3.0, "group": 1.5, "subcategory": 1.5, "content": 1.0}
+SEARCH_PROJECTION = {"title": 1, "group": 1, "subcategory": 1, "category": 1, "content": 1, "updated_at": 1, "created_at": 1}
+BM25_K1 = 1.2
+BM25_B = 0.75
+PREFIX_PENALTY = 0.5
+MIN_PREFIX = 2
+MAX_EXPANSIONS = 16
+IMPACT_DEPTH = 500
+MIN_DEPTH = 50
+MAX_CANDIDATES = 2000
+SNIPPET_CHARS = 160
+
+def fold_text(text: str):
+    """Lowercase and strip accents ("Legião" -> "legiao")."""
+    text = text.lower()
+    if text.isascii(): return text
+    return COMBINING_RE.sub("", unicodedata.normalize("NFKD", text))
+
+@lru_cache(maxsize=65536)
+def fold(token: str):
+    return fold_text(token)
+
+def tokenize(text: str):
+    return TOKEN_RE.findall(fold_text(text or ""))
+
+def page_stamp(page: dict):
+    """Last edit of a page, at Mongo's millisecond precision so local and stored stamps compare equal."""
+    stamp = page.get("updated_at") or page.get("created_at")
+    return stamp.replace(microsecond=stamp.microsecond // 1000 * 1000) if stamp else None
+
+class WikiSearchIndex:
+    def __init__(self):
+        self.postings = {}
+        self.pages = {}
+        self.total_length = 0
+        self.version = None
+        self._vocab = None
+        self._expansions = {}
+        self._norms = None
+        self._impacts = {}
+
+    def add(self, page: dict):
+        page_id = str(page["_id"])
+        self.remove(page_id)
+        page = {**page, "subcategory": page.get("subcategory", page.get("category", ""))}
+
+        weighted = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            counts = Counter(tokenize(page.get(field, "")))
+            weighted.update(counts if weight == 1.0 else {term: n * weight for term, n in counts.items()})
+
+        length = sum(weighted.values())
+        self.pages[page_id] = {
+            "title": page.get("title", ""), "group": page.get("group", ""),
+            "subcategory": page.get("subcategory", ""), "content": page.get("content", ""),
+            "length": length, "terms": tuple(weighted), "stamp": page_stamp(page),
+        }
+        self.total_length += length
+        for term, tf in weighted.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                self.postings[term] = {page_id: tf}
+                self._vocab = None
+            else:
+                postings[page_id] = tf
+        self._changed(weighted)
+
+    def remove(self, page_id: str):
+        page = self.pages.pop(page_id, None)
+        if not page: return
+        self.total_length -= page["length"]
+        for term in page["terms"]:
+            postings = self.postings[term]
+            postings.pop(page_id, None)
+            if not postings:
+                del self.postings[term]
+                self._vocab = None
+        self._changed(page["terms"])
+
+    def _changed(self, terms):
+        # Length norms are recomputed on the next search; impact orders only for the words that moved
+        self._norms = None
+        if self._impacts:
+            for term in terms: self._impacts.pop(term, None)
+
+    def norms(self):
+        """page_id -> the BM25 length normalization of its term frequencies."""
+        if self._norms is None:
+            avg_length = self.total_length / len(self.pages) or 1
+            self._norms = {pid: BM25_K1 * (1 - BM25_B + BM25_B * page["length"] / avg_length) for pid, page in self.pages.items()}
+        return self._norms
+
+    def idf(self, word: str):
+        df = len(self.postings[word])
+        return math.log(1 + (len(self.pages) - df + 0.5) / (df + 0.5))
+
+    def expand(self, term: str):
+        """The term itself plus the most common indexed words it is a prefix of."""
+        if len(term) < MIN_PREFIX:
+            return [term] if term in self.postings else []
+        if self._vocab is None:
+            self._vocab = sorted(self.postings)
+            self._expansions = {}
+        words = self._expansions.get(term)
+        if words is None:
+            start = bisect.bisect_left(self._vocab, term)
+            end = bisect.bisect_left(self._vocab, term + "\uffff")
+            words = self._vocab[start:end]
+            if len(words) > MAX_EXPANSIONS:
+                longer = heapq.nlargest(MAX_EXPANSIONS, (w for w in words if w != term), key=lambda w: len(self.postings[w]))
+                words = ([term] if term in self.postings else []) + longer
+            self._expansions[term] = words
+        return words
+
+    def weighted_postings(self, word: str, depth: int = IMPACT_DEPTH):
+        """(page_id, BM25 weight) pairs of a word; only the `depth` best for common words."""
+        postings, norms = self.postings[word], self.norms()
+        factor = self.idf(word) * (BM25_K1 + 1)
+        if len(postings) <= depth:
+            return [(pid, factor * tf / (tf + norms[pid])) for pid, tf in postings.items()]
+
+        # The order does not depend on idf, so it stays valid until a page with this word changes
+        top = self._impacts.get(word)
+        if top is None:
+            top = self._impacts[word] = heapq.nlargest(IMPACT_DEPTH, postings, key=lambda pid: postings[pid] / (postings[pid] + norms[pid]))
+        return [(pid, factor * postings[pid] / (postings[pid] + norms[pid])) for pid in top[:depth]]
+
+    def search(self, query: str, limit: int = 20):
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.pages: return []
+
+        # Only the last term is still being typed, so only it matches as a prefix
+        groups = []
+        for i, term in enumerate(terms):
+            words = self.expand(term) if i == len(terms) - 1 else ([term] if term in self.postings else [])
+            if not words: return []
+            groups.append((term, words))
+        groups.sort(key=lambda g: sum(len(self.postings[w]) for w in g[1]))
+
+        # Candidates: pages of the rarest term (a prefix shares the depth among its words)
+        term, words = groups[0]
+        depth = max(IMPACT_DEPTH // len(words), MIN_DEPTH)
+        scores = {}
+        for word in words:
+            penalty = 1.0 if word == term else PREFIX_PENALTY
+            for page_id, weight in self.weighted_postings(word, depth):
+                scores[page_id] = scores.get(page_id, 0.0) + penalty * weight
+        if len(scores) > MAX_CANDIDATES:
+            scores = dict(heapq.nlargest(MAX_CANDIDATES, scores.items(), key=lambda item: item[1]))
+
+        # Every other term must match too (exactly or as a prefix)
+        norms = self.norms()
+        for term, words in groups[1:]:
+            lookups = [
+                (self.postings[w], self.idf(w) * (BM25_K1 + 1) * (1.0 if w == term else PREFIX_PENALTY))
+                for w in words
+            ]
+            matched = {}
+            for page_id, score in scores.items():
+                found = False
+                for postings, factor in lookups:
+                    tf = postings.get(page_id)
+                    if tf:
+                        score += factor * tf / (tf + norms[page_id])
+                        found = True
+                if found: matched[page_id] = score
+            scores = matched
+            if not scores: return []
+
+        results = []
+        for page_id, score in heapq.nlargest(limit, scores.items(), key=lambda item: item[1]):
+            page = self.pages[page_id]
+            results.append({
+                "_id": page_id, "title": page["title"], "group": page["group"],
+                "subcategory": page["subcategory"], "score": round(score, 3),
+                "snippet": make_snippet(page["content"], terms),
+            })
+        return results
+
+def make_snippet(content: str, terms: list):
+    """A window of the body around the first word that matches a query term."""
+    for match in TOKEN_RE.finditer(content):
+        if fold(match.group()).startswith(tuple(terms)):
+            start = max(0, match.start() - SNIPPET_CHARS // 3)
+            end = start + SNIPPET_CHARS
+            snippet = content[start:end].strip()
+            return ("…" if start > 0 else "") + snippet + ("…" if end < len(content) else "")
+    return content[:SNIPPET_CHARS] + ("…" if len(content) > SNIPPET_CHARS else "")
+
+def build_search_index(pages: list):
+    index = WikiSearchIndex()
+    for page in pages:
+        index.add(page)
+    return index
+
+async def sync_search_index(index: WikiSearchIndex, collection):
+    """Catches up with edits made through other workers, from the wiki change log."""
+    version, changes = await wiki_changes_since(index.version)
+    if changes is None:
+        # Too far behind for the log: compare every page's stamp instead
+        stored, changed = set(), []
+        async for stub in collection.find({}, {"updated_at": 1, "created_at": 1}):
+            page_id = str(stub["_id"])
+            stored.add(page_id)
+            known = index.pages.get(page_id)
+            if not known or known["stamp"] != page_stamp(stub): changed.append(stub["_id"])
+        removed = set(index.pages) - stored
+    else:
+        changed = [ObjectId(pid) for pid, deleted in changes.items() if not deleted and ObjectId.is_valid(pid)]
+        removed = {pid for pid, deleted in changes.items() if deleted}
+
+    if changed:
+        found = set()
+        async for page in collection.find({"_id": {"$in": changed}}, SEARCH_PROJECTION):
+            index.add(page)
+            found.add(str(page["_id"]))
+        # Deleted again since the log entry was read
+        removed |= {str(page_id) for page_id in changed} - found
+    for page_id in removed:
+        index.remove(page_id)
+    index.version = version
+
+# --- SHARED INDEX ---
+# Edits that land while the first build runs in its thread are queued and
+# replayed on the new index before anyone can search it.
+_index = None
+_index_lock = asyncio.Lock()
+_building = False
+_queued = []
+
+async def get_search_index(collection):
+    global _index, _building
+    if _index is None:
+        async with _index_lock:
+            if _index is None:
+                _building = True
+                try:
+                    # Read the version first: any edit after this makes the new index stale
+                    version = await current_wiki_version()
+                    pages = await collection.find({}, SEARCH_PROJECTION).to_list(None)
+                    # Tokenizing thousands of bodies is CPU work; keep it off the event loop
+                    index = await asyncio.to_thread(build_search_index, pages)
+                finally:
+                    _building = False
+                    queued = _queued[:]
+                    _queued.clear()
+                for page_id, page in queued:
+                    if page: index.add(page)
+                    else: index.remove(page_id)
+                index.version = version
+                _index = index
+            return _index
+
+    version = await current_wiki_version()
+    if _index.version != version:
+        async with _index_lock:
+            if _index.version != version: await sync_search_index(_index, collection)
+    return _index
+
+def _applied(version: int):
+    # Our own edit needs no sync, unless another worker also edited since the index was current
+    if version is not None and _index.version == version - 1: _index.version = version
+
+def index_page(page: dict, version: int = None):
+    """Called after a page is created or edited, with the wiki version that edit produced."""
+    if _building: _queued.append((str(page["_id"]), page))
+    elif _index is not None:
+        _index.add(page)
+        _applied(version)
+
+def unindex_page(page_id: str, version: int = None):
+    if _building: _queued.append((page_id, None))
+    elif _index is not None:
+        _index.remove(page_id)
+        _applied(version)
@@ -0,0 +1,54 @@
+import time
+from pymongo import ReturnDocument
+
+from app.config import settings
+from app.database import db
+
+wiki_meta_collection = db["wiki_meta"]
+
+# --- WIKI VERSION STAMP ---
+# A counter in `wiki_meta` that every create, edit and delete bumps. The search
+# index and the index tree are held per worker; each remembers the version it
+# reflects and compares it with this one (read at most every
+# WIKI_VERSION_CHECK_SECONDS) to pick up edits made through other workers.
+#
+# The same document keeps the last CHANGE_LOG_SIZE edits as {page_id, deleted},
+# pushed by the update that bumps the counter, so the entry for version v is
+# always the (version - v)-th from the end. A worker that is behind reads only
+# the pages edited since its version instead of re-checking the whole wiki.
+CHANGE_LOG_SIZE = 500
+
+_version = None
+_checked_at = 0.0
+
+async def current_wiki_version():
+    global _version, _checked_at
+    now = time.monotonic()
+    if _version is None or now - _checked_at >= settings.WIKI_VERSION_CHECK_SECONDS:
+        doc = await wiki_meta_collection.find_one({"_id": "version"}, {"version": 1})
+        _version, _checked_at = (doc or {}).get("version", 0), now
+    return _version
+
+async def bump_wiki_version(page_id, deleted: bool = False):
+    """Records an edit of one page. Returns the new version."""
+    global _version, _checked_at
+    doc = await wiki_meta_collection.find_one_and_update(
+        {"_id": "version"},
+        {"$inc": {"version": 1},
+         "$push": {"changes": {"$each": [{"page_id": str(page_id), "deleted": deleted}], "$slice": -CHANGE_LOG_SIZE}}},
+        projection={"version": 1}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    _version, _checked_at = doc["version"], time.monotonic()
+    return _version
+
+async def wiki_changes_since(version: int):
+    """
+    (current version, {page_id: deleted}) for the pages edited after `version`,
+    or (current version, None) if the change log no longer reaches back that far.
+    """
+    doc = await wiki_meta_collection.find_one({"_id": "version"}) or {}
+    current, log = doc.get("version", 0), doc.get("changes", [])
+    missed = current - version if version is not None else None
+    if missed is None or missed < 0 or missed > len(log): return current, None
+    # Later edits of the same page win
+    return current, {entry["page_id"]: entry["deleted"] for entry in log[len(log) - missed:]}
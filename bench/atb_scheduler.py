@@ -0,0 +1,84 @@
+"""
+Combat turn scheduler cost in mass battles.
+
+    python -m bench.atb_scheduler [--combatants 200] [--rounds 2000]
+
+Compares the tick loop next_turn used to run (add speed to every living
+combatant, tick by tick, up to 1000 ticks) with advance_to_next_turn, and
+times predict_turn_order for the tracker timeline. Each scenario draws a
+fresh battle per round: usual speeds, slow (heavily encumbered) fighters,
+a field where everyone but one combatant has speed 0, and one where nobody
+can act.
+"""
+import argparse
+import copy
+import random
+import statistics
+import time
+
+from app.game_rules import advance_to_next_turn, predict_turn_order
+
+MAX_TICKS = 1000
+
+def tick_loop(combatants: list):
+    """The pre-scheduler next_turn race, kept here as the reference."""
+    living = [c for c in combatants if c["hp_current"] > 0]
+    if not living or max(c["action_points"] for c in living) >= 100: return 0
+    ticks, winner_found = 0, False
+    while not winner_found and ticks < MAX_TICKS:
+        ticks += 1
+        for c in combatants:
+            if c["hp_current"] > 0:
+                c["action_points"] += c["speed"]
+                if c["action_points"] >= 100: winner_found = True
+    return ticks
+
+def make_battle(n: int, speeds, rng: random.Random):
+    return [{
+        "id": str(i), "name": f"Fighter {i}", "type": "enemy" if i % 2 else "player",
+        "hp_current": 0 if rng.random() < 0.1 else 50, "speed": speeds(i),
+        "action_points": rng.randint(0, 60),
+    } for i in range(n)]
+
+def scenarios(rng: random.Random):
+    return {
+        "usual speeds": lambda i: rng.randint(40, 130),
+        "encumbered": lambda i: rng.randint(1, 10),
+        "one mover": lambda i: 1 if i == 0 else 0,
+        "nobody moves": lambda i: 0,
+    }
+
+def time_us(fn, battles: list):
+    timings = []
+    for battle in battles:
+        started = time.perf_counter()
+        fn(battle)
+        timings.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(timings), max(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--combatants", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{args.combatants} combatants, median / max us per call")
+    for name, speeds in scenarios(rng).items():
+        battles = [make_battle(args.combatants, speeds, rng) for _ in range(args.rounds)]
+        old, new = copy.deepcopy(battles), copy.deepcopy(battles)
+        ticks = [tick_loop(b) for b in copy.deepcopy(battles)]
+
+        loop_med, loop_max = time_us(tick_loop, old)
+        jump_med, jump_max = time_us(advance_to_next_turn, new)
+        # The same race: both must leave every combatant with the same action points
+        # (the old loop gives up after MAX_TICKS, the scheduler does not need to)
+        if max(ticks) < MAX_TICKS: assert old == new
+        k10, _ = time_us(lambda b: predict_turn_order(b, 10), battles)
+        k100, _ = time_us(lambda b: predict_turn_order(b, 100), battles)
+        print(f"  {name:>13} ({statistics.median(ticks):>4.0f} ticks): tick loop {loop_med:8.1f} / {loop_max:8.1f}"
+              f"  scheduler {jump_med:6.1f} / {jump_max:6.1f}  timeline k=10 {k10:6.1f}  k=100 {k100:6.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Per-request auth overhead with and without the decoded-token cache.
+
+    python -m bench.auth_cache [--users 500] [--requests 20000] [--rps 2000]
+
+Replays --requests authenticated requests spread over --users logged-in
+sessions through get_current_user, once with its token cache and once with a
+jwt.decode per request (what it did before). Reports microseconds per
+request and the share of one core that auth would take at --rps requests per
+second. The cached run starts empty, so each session's first request pays a
+full decode.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from jose import jwt
+
+import app.auth.dependencies as deps
+from app.auth.security import create_access_token
+from app.config import settings
+
+class StubRequest:
+    """get_current_user only reads the cookie."""
+    def __init__(self, token: str):
+        self.cookies = {"access_token": f"Bearer {token}"}
+
+async def uncached(request):
+    token = deps._split_bearer(request.cookies.get("access_token"))
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    return {"sub": payload.get("sub"), "role": payload.get("role"), "id": payload.get("id")}
+
+async def replay(fn, requests: list):
+    started = time.perf_counter()
+    for request in requests:
+        assert await fn(request)
+    return (time.perf_counter() - started) * 1e6 / len(requests)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rps", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sessions = [StubRequest(create_access_token({"sub": f"user{i}@example.com", "role": "Player", "id": str(i)})) for i in range(args.users)]
+    requests = [rng.choice(sessions) for _ in range(args.requests)]
+
+    await replay(uncached, requests[:500])  # warm up
+    results = {"jwt.decode": await replay(uncached, requests)}
+    deps._token_cache.clear()
+    results["cached"] = await replay(deps.get_current_user, requests)
+
+    print(f"{args.requests} requests over {args.users} sessions")
+    for name, us in results.items():
+        print(f"  {name:>10}: {us:6.1f} us/request  {us * args.rps / 1e4:5.2f}% of a core at {args.rps} RPS")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+"""
+What the character summary projection saves per listing.
+
+    python -m bench.character_summary [--characters 50]
+
+Builds synthetic characters (bench.synthetic), applies
+CHARACTER_SUMMARY_PROJECTION the way mongod would, and compares full
+documents with summaries: BSON bytes on the wire, Python heap held by the
+decoded list (tracemalloc), and time to decode a listing's worth of replies.
+"""
+import argparse
+import random
+import statistics
+import time
+import tracemalloc
+
+import bson
+
+from app.characters.models import CHARACTER_SUMMARY_PROJECTION
+from bench.synthetic import make_character
+
+def project(doc: dict, projection: dict):
+    """An inclusion projection with dotted paths; _id is kept, as in find()."""
+    out = {"_id": doc["_id"]}
+    for path in projection:
+        *parents, leaf = path.split(".")
+        src, dst = doc, out
+        for key in parents:
+            src, dst = src.get(key, {}), dst.setdefault(key, {})
+        if leaf in src: dst[leaf] = src[leaf]
+    return out
+
+def held_bytes(payloads: list):
+    """Heap retained by decoding the payloads, as a to_list() result would hold it."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    docs = [bson.decode(p) for p in payloads]
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del docs
+    return held
+
+def decode_ms(payloads: list, rounds: int = 50):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for p in payloads: bson.decode(p)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--characters", type=int, default=50, help="Characters in one listing (list_campaigns loads up to 50)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    chars = [make_character(rng) for _ in range(args.characters)]
+    rows = {
+        "full": [bson.encode(c) for c in chars],
+        "summary": [bson.encode(project(c, CHARACTER_SUMMARY_PROJECTION)) for c in chars],
+    }
+    print(f"{args.characters} characters")
+    for name, payloads in rows.items():
+        wire = sum(len(p) for p in payloads)
+        print(f"  {name:>8}: wire {wire / 1024:8.1f} KiB ({wire // len(payloads):6d} B/doc)"
+              f"  heap {held_bytes(payloads) / 1024:8.1f} KiB  decode {decode_ms(payloads):6.2f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Bytes and server time per combat action: full dashboard re-render versus
+the streamed delta.
+
+    python -m bench.combat_updates [--players 6] [--enemies 12] [--rounds 200]
+
+Before, every combat button posted, followed a 303 and re-rendered
+campaign_dashboard.html. Now the button posts with Accept: application/json,
+gets {"ok": true} back, and every open stream receives one small SSE delta.
+The dashboard is rendered from synthetic data (bench.synthetic) with the
+app's own templates, so the byte counts are real; the times are the server's
+render / serialize work only, without the queries the dashboard route also
+made (campaign, party, bestiary, actions, encounter, equipment) or the one
+versioned encounter write both paths share.
+"""
+import argparse
+import gzip
+import json
+import random
+import statistics
+import time
+
+from app.campaigns.combat import build_delta
+from app.core.i18n import load_translations
+from app.config import settings
+from app.game_rules import DIFFICULTY_LEVELS, DEFAULT_GAME_ACTIONS, compile_skill_rules, compute_derived_stats
+import app.game_rules as rules
+from app.templates import templates
+from bench.synthetic import WORDS, make_character, make_skill_rules
+
+class StubRequest:
+    """What base.html reads from the request."""
+    query_params = {}
+    url = "/campaigns/bench/dashboard"
+
+def make_dashboard_context(rng: random.Random, n_players: int, n_enemies: int):
+    party = []
+    for _ in range(n_players):
+        char = make_character(rng)
+        char["derived"] = compute_derived_stats(char)
+        party.append(char)
+
+    combatants = [{
+        "id": str(c["_id"]), "name": c["name"], "type": "Player", "hp_current": 60, "hp_max": 100,
+        "stamina_current": 80, "stamina_max": 100, "speed": c["derived"]["current_speed"], "action_points": rng.uniform(0, 120),
+        "damage": 10, "defense": 5, "crit_bonus": 50,
+    } for c in party] + [{
+        "id": f"enemy{i}", "name": f"{rng.choice(WORDS).title()} Raider {i}", "type": "Enemy", "hp_current": 30, "hp_max": 30,
+        "stamina_current": 50, "stamina_max": 50, "speed": rng.randint(60, 120), "action_points": rng.uniform(0, 99),
+        "damage": 8, "defense": 3, "crit_bonus": 25,
+    } for i in range(n_enemies)]
+    for i, c in enumerate(combatants):
+        c.update(index=i, ammo_remaining=None, is_ranged=False)
+
+    campaign = {
+        "_id": "65f000000000000000000000", "gm_id": "gm", "name": "The Iron March", "status": "Active",
+        "party_gold": 1200, "upkeep_cost": 40, "map_url": "https://i.imgur.com/7j8j8j8.png",
+        "members": [{"user_id": str(c["user_id"]), "character_id": str(c["_id"]), "character_name": c["name"], "status": "Accepted"} for c in party],
+        "map_pins": [{"id": str(i), "x": rng.random() * 100, "y": rng.random() * 100, "label": rng.choice(WORDS), "type": "Location"} for i in range(20)],
+        "combat_active": True, "combatants": combatants,
+        "combat_log": [f"{rng.choice(combatants)['name']} hits for {rng.randint(1, 12)} damage." for _ in range(10)],
+    }
+    bestiary = [{"_id": str(i), "name": f"{rng.choice(WORDS).title()} Raider", "hp_max": 30} for i in range(30)]
+    return {
+        "request": StubRequest(), "user": {"sub": "gm@example.com", "role": "GM", "id": "gm"}, "campaign": campaign,
+        "party": party, "party_speed": 100, "actions": DEFAULT_GAME_ACTIONS, "difficulty_levels": DIFFICULTY_LEVELS,
+        "bestiary": bestiary,
+    }
+
+def attack_delta(rng: random.Random, n: int):
+    """The set_ops and log line combat_action records for one attack."""
+    actor, target = rng.sample(range(n), 2)
+    set_ops = {
+        f"combatants.{actor}.stamina_current": 70, f"combatants.{actor}.action_points": rng.uniform(0, 20),
+        f"combatants.{target}.hp_current": rng.randint(0, 30), f"combatants.{target}.action_points": rng.uniform(0, 90),
+    }
+    return set_ops, f"Raider {actor} hits Raider {target} for {rng.randint(1, 12)} damage."
+
+def timed(fn, rounds: int):
+    timings, out = [], None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        out = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), out
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--players", type=int, default=6)
+    parser.add_argument("--enemies", type=int, default=12)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rules._skill_trees, rules._skill_modifiers = compile_skill_rules(make_skill_rules(rng))
+    load_translations(settings.LANGUAGE)
+    context = make_dashboard_context(rng, args.players, args.enemies)
+    template = templates.get_template("campaign_dashboard.html")
+
+    render_ms, html = timed(lambda: template.render(**context).encode("utf-8"), args.rounds)
+    redirect = b"HTTP/1.1 303 See Other\r\nlocation: /campaigns/65f000000000000000000000/dashboard\r\ncontent-length: 0\r\n\r\n"
+    before = len(redirect) + len(html)
+
+    set_ops, msg = attack_delta(rng, len(context["campaign"]["combatants"]))
+    delta_ms, event = timed(lambda: f"data: {json.dumps(build_delta(set_ops, msg), default=str)}\n\n".encode("utf-8"), args.rounds)
+    ack = json.dumps({"ok": True}).encode("utf-8")
+    after = len(ack) + len(event)
+
+    print(f"{args.players} players, {args.enemies} enemies, per combat action")
+    print(f"  before (303 + dashboard): {before:7d} B  ({len(gzip.compress(html)):6d} B gzipped)  render {render_ms:6.2f} ms")
+    print(f"  after  (ack + SSE delta): {after:7d} B  ({len(gzip.compress(event)):6d} B gzipped)  delta  {delta_ms:6.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Campaign list latency with 1,000 campaigns.
+
+    python -m bench.list_campaigns [--campaigns 1000] [--rounds 200]
+
+Needs a mongod at MONGO_URL. Seeds a throwaway database (dropped afterwards)
+with campaigns that carry members, map pins and descriptions, plus synthetic
+characters (bench.synthetic), applies the app's indexes, then times the four
+list_campaigns queries two ways for a GM who runs and plays in a few dozen
+campaigns: one after another returning whole documents (the old route), and
+concurrently, keyset-paged, with LIST_PROJECTIONS and the character summary
+projection (the current route). Also reports the BSON bytes each way returns.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import bson
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.campaigns.routes import LIST_PROJECTIONS
+from app.characters.models import CHARACTER_SUMMARY_PROJECTION
+from app.config import settings
+from app.core.indexes import ensure_indexes
+from app.core.pagination import keyset_page
+from bench.synthetic import WORDS, make_character
+
+BENCH_DB = "imperium_bench_list_campaigns"
+
+def make_campaign(rng: random.Random, gm_id: str, members: list):
+    return {
+        "gm_id": gm_id, "name": " ".join(rng.choices(WORDS, k=3)).title(),
+        "description": " ".join(rng.choices(WORDS, k=rng.randint(50, 300))),
+        "status": rng.choice(["Active", "Active", "Paused", "Archived"]),
+        "map_url": "https://i.imgur.com/7j8j8j8.png", "party_gold": rng.randint(0, 20000), "upkeep_cost": rng.randint(0, 500),
+        "members": [{"user_id": uid, "character_id": str(ObjectId()), "character_name": rng.choice(WORDS).title(),
+                     "status": rng.choice(["Pending", "Accepted", "Accepted"])} for uid in members],
+        "map_pins": [{"id": str(ObjectId()), "x": rng.random() * 100, "y": rng.random() * 100,
+                      "label": " ".join(rng.choices(WORDS, k=3)), "type": "Location"} for _ in range(rng.randint(5, 60))],
+        "combat_active": False,
+    }
+
+async def seed(database, args, rng: random.Random):
+    user_id = ObjectId()
+    uid, others = str(user_id), [str(ObjectId()) for _ in range(200)]
+    campaigns = []
+    for i in range(args.campaigns):
+        gm = uid if i < args.own else rng.choice(others)
+        members = rng.sample(others, rng.randint(2, 8))
+        if args.own <= i < args.own + args.joined: members.append(uid)
+        campaigns.append(make_campaign(rng, gm, members))
+    await database["campaigns"].insert_many(campaigns)
+    await database["characters"].insert_many([make_character(rng, user_id) for _ in range(args.characters)])
+    return {"id": uid, "role": "GM"}
+
+async def sequential_full(database, user: dict):
+    camps, chars = database["campaigns"], database["characters"]
+    mine = await camps.find({"gm_id": user["id"]}).to_list(100)
+    participating = await camps.find({"members.user_id": user["id"]}).to_list(100)
+    available = await camps.find({"gm_id": {"$ne": user["id"]}, "members.user_id": {"$ne": user["id"]}, "status": "Active"}).to_list(100)
+    my_chars = await chars.find({"user_id": ObjectId(user["id"])}).to_list(50)
+    return mine, participating, available, my_chars
+
+async def concurrent_projected(database, user: dict):
+    camps, chars = database["campaigns"], database["characters"]
+    (mine, _), (participating, _), (available, _), my_chars = await asyncio.gather(
+        keyset_page(camps, {"gm_id": user["id"]}, LIST_PROJECTIONS["my"]),
+        keyset_page(camps, {"members.user_id": user["id"]}, LIST_PROJECTIONS["participating"]),
+        keyset_page(camps, {"gm_id": {"$ne": user["id"]}, "members.user_id": {"$ne": user["id"]}, "status": "Active"}, LIST_PROJECTIONS["available"]),
+        chars.find({"user_id": ObjectId(user["id"])}, CHARACTER_SUMMARY_PROJECTION).to_list(50),
+    )
+    return mine, participating, available, my_chars
+
+async def measure(fn, database, user: dict, rounds: int):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = await fn(database, user)
+        timings.append((time.perf_counter() - started) * 1000)
+    size = sum(len(bson.encode(doc)) for docs in result for doc in docs)
+    return statistics.median(timings), sorted(timings)[int(len(timings) * 0.95)], size
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--campaigns", type=int, default=1000)
+    parser.add_argument("--own", type=int, default=30, help="Campaigns the benchmark user runs as GM")
+    parser.add_argument("--joined", type=int, default=30, help="Campaigns the benchmark user plays in")
+    parser.add_argument("--characters", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(settings.MONGO_URL, serverSelectionTimeoutMS=5000)
+    await client.admin.command("ping")
+    database = client[BENCH_DB]
+    try:
+        await ensure_indexes(database)
+        user = await seed(database, args, random.Random(args.seed))
+        for fn in (sequential_full, concurrent_projected):
+            await measure(fn, database, user, 10)  # warm up
+            p50, p95, size = await measure(fn, database, user, args.rounds)
+            print(f"{fn.__name__:>20}: p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  {size / 1024:8.1f} KiB returned")
+    finally:
+        await client.drop_database(BENCH_DB)
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
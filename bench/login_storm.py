@@ -0,0 +1,81 @@
+"""
+Tail latency of an unrelated route while a burst of logins is hashing passwords.
+
+    python -m bench.login_storm [--logins 100] [--concurrency 16] [--probes 200]
+
+Runs the app in process (httpx over ASGI, no server, no Mongo) and requests
+GET / every --interval seconds while --concurrency tasks keep verifying an
+Argon2 hash, --logins times in total. Two modes are compared:
+
+  inline  pwd_context.verify called on the event loop (the old behaviour)
+  pool    app.auth.security.verify_password (bounded executor)
+
+Uses the Argon2 costs from Settings, so ARGON2_* in .env apply here too.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from app.auth.security import PasswordHashingBusy, pwd_context, verify_password
+from app.main import app
+
+def percentile(samples: list, pct: float):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+async def storm(mode: str, hashed: str, logins: int, concurrency: int, probes: int, interval: float):
+    remaining = [logins]
+    login_times, busy = [], [0]
+
+    async def login_worker():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                if mode == "inline":
+                    pwd_context.verify("correct horse", hashed)
+                else:
+                    await verify_password("correct horse", hashed)
+                login_times.append((time.perf_counter() - started) * 1000)
+            except PasswordHashingBusy:
+                busy[0] += 1
+            await asyncio.sleep(0)
+
+    probe_times = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/")  # warm up templates
+        workers = [asyncio.create_task(login_worker()) for _ in range(concurrency)]
+        # Latency counts from when the probe was due, so time spent stuck behind a hash shows up
+        started = time.perf_counter()
+        for i in range(probes):
+            due = started + i * interval
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            await client.get("/")
+            probe_times.append((time.perf_counter() - due) * 1000)
+        await asyncio.gather(*workers)
+    return probe_times, login_times, busy[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--probes", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.01, help="Seconds between GET / probes")
+    args = parser.parse_args()
+
+    hashed = pwd_context.hash("correct horse")
+    print(f"argon2 parameters: {hashed.split('$')[3]}")
+    for mode in ("inline", "pool"):
+        probes, logins, busy = asyncio.run(storm(mode, hashed, args.logins, args.concurrency, args.probes, args.interval))
+        print(
+            f"{mode:>6}: GET / p50 {statistics.median(probes):7.1f} ms  p95 {percentile(probes, 0.95):7.1f} ms  "
+            f"p99 {percentile(probes, 0.99):7.1f} ms | login p95 {percentile(logins, 0.95) if logins else 0:7.1f} ms, "
+            f"{len(logins)} verified, {busy} turned away"
+        )
+
+if __name__ == "__main__":
+    main()
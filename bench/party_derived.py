@@ -0,0 +1,62 @@
+"""
+Party derived-stats latency as the party grows.
+
+    python -m bench.party_derived [--sizes 4,8,16,32,50] [--rounds 200]
+
+Times calculate_party_derived_stats against the old per-character loop of
+calculate_derived_stats on synthetic characters (bench.synthetic), with the
+compiled rules cache warm as it is after startup. "batched" computes every
+member; "stored" is the same call when every character already carries a
+current materialized derived block, which is the path that stays flat.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import app.game_rules as rules
+from bench.synthetic import make_character, make_skill_rules
+
+def warm_cache(docs: list):
+    rules._skill_trees, rules._skill_modifiers = rules.compile_skill_rules(docs)
+    rules._rules_version = rules.hash_skill_rules(docs)
+    rules._rules_loaded = True
+
+async def serial(party: list):
+    return [await rules.calculate_derived_stats(char) for char in party]
+
+async def batched(party: list):
+    return await rules.calculate_party_derived_stats(party)
+
+async def measure(fn, party: list, rounds: int):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await fn(party)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="4,8,16,32,50")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    docs = make_skill_rules(rng)
+    sizes = [int(s) for s in args.sizes.split(",")]
+    parties = {n: [make_character(rng) for _ in range(n)] for n in sizes}
+
+    warm_cache(docs)
+    print("warm cache (median ms per party)")
+    for n, party in parties.items():
+        assert await serial(party) == await batched(party)
+        stored = [{**char, "derived": await rules.materialize_derived_stats(char)} for char in party]
+        s, b = await measure(serial, party, args.rounds), await measure(batched, party, args.rounds)
+        m = await measure(batched, stored, args.rounds)
+        print(f"  {n:>3} members: serial {s:7.3f}  batched {b:7.3f}  stored {m:7.3f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
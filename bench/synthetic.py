@@ -0,0 +1,76 @@
+"""
+Synthetic game data shared by the benchmarks: skill rules shaped like the
+skills_rules collection and characters shaped like CharacterInDB, with
+unlocked skill nodes, a filled inventory, equipment, fiefs and notes.
+"""
+import random
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from app.game_rules import ATTRIBUTES, SKILL_CATEGORIES
+
+TIERS = 10
+MODIFIER_STATS = ["damage", "defense", "speed", "max_load", "hp_max", "stamina", "critical_damage"]
+CONDITIONS = ["always", "always", "equip:One-Handed", "equip:Shield", "equip:Bow", "equip:Horse"]
+WEAPONS = ["One-Handed", "Two-Handed", "Polearm", "Bow", "Crossbow", "Throwing"]
+WORDS = ["legion", "cohort", "banner", "march", "siege", "river", "grain", "salt", "iron", "oath", "tribute", "garrison"]
+
+def make_skill_rules(rng: random.Random):
+    """One skills_rules document per skill, ten tiers, two or three choices per tier."""
+    docs = []
+    for skills in SKILL_CATEGORIES.values():
+        for name in skills:
+            tree = []
+            for tier in range(1, TIERS + 1):
+                choices = []
+                for c in range(3 if tier == TIERS else 2):
+                    modifiers = [
+                        {"stat": rng.choice(MODIFIER_STATS), "value": rng.randint(1, 5), "condition": rng.choice(CONDITIONS)}
+                        for _ in range(rng.randint(1, 3))
+                    ]
+                    choices.append({"id": f"c{c + 1}", "name": f"{name} {tier}.{c + 1}", "description": "", "modifiers": modifiers})
+                tree.append({"tier": tier, "required_attribute_val": tier * 2, "choices": choices})
+            docs.append({"_id": ObjectId(), "name": name, "tree": tree})
+    return docs
+
+def make_item(rng: random.Random, category: str = "General", weapon_type: str = "None"):
+    return {
+        "id": str(ObjectId()), "name": " ".join(rng.choices(WORDS, k=2)).title(),
+        "description": " ".join(rng.choices(WORDS, k=rng.randint(5, 20))),
+        "quantity": rng.randint(1, 5), "weight": round(rng.uniform(0.1, 6.0), 1),
+        "category": category, "weapon_type": weapon_type,
+        "damage": rng.randint(0, 12) if category == "Weapon" else 0,
+        "defense": rng.randint(0, 10) if category in ("Weapon", "Armor") else 0,
+        "is_two_handed": False, "carry_bonus_kg": 60.0 if category == "Horse" else 0.0,
+    }
+
+def make_character(rng: random.Random, user_id: ObjectId = None):
+    stats = {}
+    for attr in ATTRIBUTES:
+        skills = {}
+        for skill in SKILL_CATEGORIES[attr]:
+            unlocked = rng.randint(0, TIERS)
+            skills[skill] = {"nodes_unlocked": {str(t): rng.randint(0, 2 if t == TIERS else 1) for t in range(1, unlocked + 1)}}
+        stats[attr] = {"value": rng.randint(1, 20), "skills": skills}
+
+    equipment = {
+        "armor": make_item(rng, "Armor"),
+        "hand_main": make_item(rng, "Weapon", rng.choice(WEAPONS)),
+        "hand_off": make_item(rng, "Armor", "Shield") if rng.random() < 0.5 else None,
+        "horse": make_item(rng, "Horse") if rng.random() < 0.5 else None,
+    }
+    return {
+        "_id": ObjectId(), "user_id": user_id or ObjectId(),
+        "name": " ".join(rng.choices(WORDS, k=2)).title(), "class_archetype": rng.choice(["Legionary", "Scout", "Merchant", "Scholar"]),
+        "culture": "Imperial", "image_url": "https://i.imgur.com/62jO8iC.png",
+        "public_bio": " ".join(rng.choices(WORDS, k=rng.randint(50, 200))),
+        "private_notes": " ".join(rng.choices(WORDS, k=rng.randint(50, 400))),
+        "stats": stats,
+        "status": {"level": rng.randint(1, 20), "hp_current": 100, "hp_max": 100, "stamina": 100, "speed": 100, "gold": rng.randint(0, 5000), "current_load": 0.0, "max_load": 30.0},
+        "points": {"attribute_points": 0, "skill_points": rng.randint(0, 5)},
+        "inventory": [make_item(rng) for _ in range(rng.randint(10, 40))],
+        "equipment": equipment,
+        "fiefs": [{"id": str(ObjectId()), "name": rng.choice(WORDS).title(), "type": "Village", "income": rng.randint(10, 500)} for _ in range(rng.randint(0, 4))],
+        "updated_at": datetime.now(timezone.utc), "revision": rng.randint(1, 50),
+    }
@@ -0,0 +1,87 @@
+"""
+Template cold start: first render per locale after a worker starts.
+
+    python -m bench.template_cold_start [--runs 5]
+
+Each measurement is a fresh interpreter, as after a deploy or worker
+restart. Three setups:
+
+  lazy        PRODUCTION off: each template is parsed and compiled by the
+              first request that renders it in each locale.
+  cold cache  PRODUCTION on with an empty TEMPLATE_CACHE_DIR: boot pays
+              precompile() (parse + compile every template per locale) and
+              writes the bytecode cache.
+  warm cache  PRODUCTION on, cache left by the previous run: precompile()
+              only loads bytecode.
+
+Reports the boot-time precompile and the first render of the heavy pages in
+every locale (median over --runs processes).
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PAGES = ["character_sheet.html", "campaign_dashboard.html", "dashboard.html"]
+
+def child():
+    """Runs in the fresh interpreter; prints its timings as JSON."""
+    from app.config import settings
+    from app.core.i18n import available_locales, load_translations, set_locale
+    import app.game_rules as rules
+    from app.templates import templates
+    from bench.combat_updates import make_dashboard_context
+    from bench.synthetic import make_skill_rules
+    from bench.template_render import roster_context, sheet_context
+
+    rng = random.Random(7)
+    rules._skill_trees, rules._skill_modifiers = rules.compile_skill_rules(make_skill_rules(rng))
+    load_translations(settings.LANGUAGE)
+    contexts = {"character_sheet.html": sheet_context(rng), "campaign_dashboard.html": make_dashboard_context(rng, 6, 12), "dashboard.html": roster_context(rng)}
+
+    result = {"precompile": 0.0, "first_render": 0.0}
+    if settings.PRODUCTION:
+        started = time.perf_counter()
+        templates.precompile()
+        result["precompile"] = (time.perf_counter() - started) * 1000
+
+    for lang in available_locales():
+        set_locale(lang)
+        for name in PAGES:
+            started = time.perf_counter()
+            templates.get_template(name).render(**contexts[name])
+            result["first_render"] += (time.perf_counter() - started) * 1000
+    print(json.dumps(result))
+
+def run(production: bool, cache_dir: str):
+    env = {**os.environ, "PRODUCTION": "1" if production else "0", "TEMPLATE_CACHE_DIR": cache_dir}
+    out = subprocess.run([sys.executable, "-m", "bench.template_cold_start", "--child"], env=env, check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child: return child()
+
+    samples = {"lazy": [], "cold cache": [], "warm cache": []}
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            samples["lazy"].append(run(False, cache_dir))
+            samples["cold cache"].append(run(True, cache_dir))
+            samples["warm cache"].append(run(True, cache_dir))
+
+    print(f"first render of {', '.join(PAGES)} in every locale (median ms over {args.runs} processes)")
+    for name, results in samples.items():
+        pre = statistics.median(r["precompile"] for r in results)
+        first = statistics.median(r["first_render"] for r in results)
+        print(f"  {name:>10}: boot precompile {pre:7.1f}  first renders {first:7.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Render time of the heavy pages: compile-time translation and the wiki
+render cache.
+
+    python -m bench.template_render [--locale pt_BR] [--rounds 200]
+
+1. character_sheet.html, campaign_dashboard.html and dashboard.html rendered
+   with the runtime |trans filter (the shared environment) and with the
+   locale's compiled overlay, where literal |trans calls are already folded
+   into the template (templates.env_for).
+2. A heavy wiki page (long body, many [[links]] and backlinks) viewed with a
+   cold render cache (render the article, store it, render the page shell)
+   and a warm one (read the article, render the shell), on the memory and the
+   disk backend. The cold case leaves out the two link queries render_article
+   also makes.
+
+Data is synthetic (bench.synthetic); the templates are the app's own.
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+from app.config import settings
+from app.core.i18n import load_translations, set_locale
+from app.game_rules import compile_skill_rules, compute_derived_stats
+import app.game_rules as rules
+from app.templates import templates
+from app.wiki.links import LINK_RE
+from app.wiki.render_cache import DiskRenderCache, MemoryRenderCache
+from bench.combat_updates import StubRequest, make_dashboard_context
+from bench.synthetic import WORDS, make_character, make_skill_rules
+
+GM = {"sub": "gm@example.com", "role": "GM", "id": "gm"}
+
+def sheet_context(rng: random.Random):
+    char = make_character(rng)
+    derived = compute_derived_stats(char)
+    return {
+        "request": StubRequest(), "user": GM, "character": char, "is_owner": True, "is_gm": True,
+        "current_load": derived["current_load"], "max_load": derived["max_load"], "attack": derived["attack"],
+        "defense": derived["defense"], "crit_bonus": derived["crit_bonus"], "max_stamina": 100 + derived["bonus_stamina"],
+        "speed": derived["current_speed"], "max_speed": derived["max_speed"],
+    }
+
+def roster_context(rng: random.Random, n: int = 50):
+    chars = [make_character(rng) for _ in range(n)]
+    return {"request": StubRequest(), "user": GM, "characters": chars, "next_cursor": None, "is_first_page": True}
+
+def wiki_page(rng: random.Random, paragraphs: int = 120, links: int = 150):
+    body = [" ".join(rng.choices(WORDS, k=rng.randint(30, 80))) for _ in range(paragraphs)]
+    for _ in range(links):
+        i = rng.randrange(paragraphs)
+        body[i] += f" [[{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}]]"
+    content = "\n\n".join(body)
+
+    # What resolve_links returns, with about one link in five broken
+    segments, pos = [], 0
+    for m in LINK_RE.finditer(content):
+        segments.append({"text": content[pos:m.start()]})
+        target = m.group(1).strip()
+        segments.append({"text": target, "link": True, "target": target, "url": None if rng.random() < 0.2 else f"/wiki/{rng.randrange(10**6)}"})
+        pos = m.end()
+    segments.append({"text": content[pos:]})
+    page = {"_id": "65f000000000000000000000", "title": "The Iron March", "category": "Lore", "content": content}
+    backlinks = [{"_id": str(i), "title": f"{rng.choice(WORDS).title()} {i}"} for i in range(60)]
+    return page, segments, backlinks
+
+def compare_ms(a, b, rounds: int):
+    """Medians of two callables timed alternately, so drift on a busy machine hits both alike."""
+    times = ([], [])
+    for _ in range(rounds):
+        for fn, out in ((a, times[0]), (b, times[1])):
+            started = time.perf_counter()
+            fn()
+            out.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times[0]), statistics.median(times[1])
+
+def view(cache, page: dict, segments: list, backlinks: list, warm: bool):
+    """What view_page does after its stamp query, minus the body and link queries."""
+    article = templates.get_template("partials/wiki_article.html")
+    shell = templates.get_template("wiki_page.html")
+    def run():
+        if not warm: cache.invalidate(page["_id"])
+        html = cache.get(page["_id"], "v")
+        if html is None:
+            html = article.render(page=page, user=GM, segments=segments, backlinks=backlinks)
+            cache.set(page["_id"], "v", html)
+        return shell.render(request=StubRequest(), user=GM, page=page, article_html=html)
+    return run
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--locale", default="pt_BR")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rules._skill_trees, rules._skill_modifiers = compile_skill_rules(make_skill_rules(rng))
+    load_translations(settings.LANGUAGE)
+    set_locale(args.locale)
+
+    pages = {
+        "character_sheet.html": sheet_context(rng),
+        "campaign_dashboard.html": make_dashboard_context(rng, 6, 12),
+        "dashboard.html": roster_context(rng),
+    }
+    print(f"page renders in {args.locale} (median ms)")
+    for name, context in pages.items():
+        runtime, compiled = templates.env.get_template(name), templates.env_for(args.locale).get_template(name)
+        assert runtime.render(**context) == compiled.render(**context)
+        r, c = compare_ms(lambda: runtime.render(**context), lambda: compiled.render(**context), args.rounds)
+        print(f"  {name:>24}: runtime |trans {r:6.2f}  compiled {c:6.2f}  ({c / r:.2f}x)")
+
+    page, segments, backlinks = wiki_page(rng)
+    print(f"wiki page view, {len(page['content']) // 1024} KiB body, {len(segments) // 2} links, {len(backlinks)} backlinks (median ms)")
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend, cache in (("memory", MemoryRenderCache(256)), ("disk", DiskRenderCache(tmp))):
+            cold, warm = compare_ms(view(cache, page, segments, backlinks, warm=False), view(cache, page, segments, backlinks, warm=True), args.rounds)
+            print(f"  {backend:>6}: cold {cold:6.2f}  warm {warm:6.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Revision history storage growth and rebuild time over 1,000 edits.
+
+    python -m bench.wiki_revisions [--edits 1000] [--lines 200]
+
+Edits one synthetic page --edits times (each edit rewrites, inserts or
+deletes a few lines, or appends a paragraph) and stores every revision the
+way record_revision does: a compressed snapshot every SNAPSHOT_EVERY
+revisions, compressed line deltas in between. Reports the BSON bytes of the
+revision documents against keeping a full copy per revision (plain and
+zlib-compressed), and the time to rebuild revisions from their snapshot
+(worst case: SNAPSHOT_EVERY - 1 deltas). Rebuild time is the decode work
+only; load_revision also fetches those documents in one indexed query.
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime
+
+import bson
+
+from app.wiki.revisions import SNAPSHOT_EVERY, apply_delta, decode_snapshot, encode_delta, encode_snapshot
+from bench.synthetic import WORDS
+
+def sentence(rng: random.Random):
+    return " ".join(rng.choices(WORDS, k=rng.randint(6, 18))).capitalize() + "."
+
+def edit(lines: list, rng: random.Random):
+    lines = lines[:]
+    kind = rng.random()
+    if kind < 0.6:
+        for _ in range(rng.randint(1, 3)): lines[rng.randrange(len(lines))] = sentence(rng)
+    elif kind < 0.8:
+        at = rng.randrange(len(lines) + 1)
+        lines[at:at] = [sentence(rng) for _ in range(rng.randint(1, 5))]
+    elif kind < 0.9 and len(lines) > 20:
+        at = rng.randrange(len(lines) - 5)
+        del lines[at:at + rng.randint(1, 5)]
+    else:
+        lines += [""] + [sentence(rng) for _ in range(rng.randint(3, 8))]
+    return lines
+
+def revision_doc(rev: int, data: bytes, kind: str):
+    """Same fields record_revision stores."""
+    return {"page_id": "65f000000000000000000000", "rev": rev, "kind": kind, "data": data,
+            "title": "Iron March", "author": "gm@example.com", "created_at": datetime.utcnow()}
+
+def rebuild(entries: list, rev: int):
+    base = rev - rev % SNAPSHOT_EVERY
+    text = decode_snapshot(entries[base]["data"])
+    for entry in entries[base + 1:rev + 1]:
+        text = apply_delta(text, entry["data"])
+    return text
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--edits", type=int, default=1000)
+    parser.add_argument("--lines", type=int, default=200, help="Lines in the first revision")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    lines = [sentence(rng) for _ in range(args.lines)]
+    texts, entries, encode_ms = [], [], []
+    previous = None
+    for rev in range(args.edits + 1):
+        text = "\n".join(lines)
+        started = time.perf_counter()
+        if previous is None or rev % SNAPSHOT_EVERY == 0:
+            entries.append(revision_doc(rev, encode_snapshot(text), "snapshot"))
+        else:
+            entries.append(revision_doc(rev, encode_delta(previous, text), "delta"))
+        encode_ms.append((time.perf_counter() - started) * 1000)
+        texts.append(text)
+        previous, lines = text, edit(lines, rng)
+
+    stored = sum(len(bson.encode(e)) for e in entries)
+    full = sum(len(bson.encode({**revision_doc(rev, b"", "full"), "data": text})) for rev, text in enumerate(texts))
+    print(f"{len(entries)} revisions, last {len(texts[-1]) / 1024:.1f} KiB of text ({texts[-1].count(chr(10)) + 1} lines)")
+    zipped = sum(len(bson.encode(revision_doc(rev, encode_snapshot(text), "snapshot"))) for rev, text in enumerate(texts))
+    print(f"  stored: {stored / 1024:8.1f} KiB  vs full copies {full / 1024:8.1f} KiB ({full / stored:.0f}x),"
+          f" compressed full copies {zipped / 1024:8.1f} KiB ({zipped / stored:.1f}x)")
+    print(f"  encode per save: median {statistics.median(encode_ms):.2f} ms  max {max(encode_ms):.2f} ms")
+
+    timings = []
+    for rev in range(len(entries)):
+        started = time.perf_counter()
+        text = rebuild(entries, rev)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert text == texts[rev]
+    worst = max(range(len(timings)), key=timings.__getitem__)
+    print(f"  rebuild: median {statistics.median(timings):.2f} ms  worst {timings[worst]:.2f} ms (rev {worst}, {worst % SNAPSHOT_EVERY} deltas)")
+
+if __name__ == "__main__":
+    main()
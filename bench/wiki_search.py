@@ -0,0 +1,86 @@
+"""
+Wiki search latency on a synthetic corpus.
+
+    python -m bench.wiki_search [--pages 20000] [--words 200] [--queries 2000]
+
+Pages are --words tokens drawn from a Zipf-distributed vocabulary of
+syllable-built words, so common words and short prefixes hit thousands of
+pages the way they do in a real wiki. Reports index build time and
+p50/p95/max latency of WikiSearchIndex.search for full-word queries and for
+2- and 3-character prefixes.
+"""
+import argparse
+import itertools
+import random
+import statistics
+import time
+
+from app.wiki.search import build_search_index
+
+SYLLABLES = ["ka", "ro", "mi", "te", "sa", "lu", "ven", "dor", "ael", "gri", "tho", "us", "an", "el", "cav", "leg", "ion", "ar", "ix", "bra"]
+
+def make_vocabulary(size: int, rng: random.Random):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+def make_pages(n_pages: int, n_words: int, vocab: list, rng: random.Random):
+    weights = list(itertools.accumulate(1 / (rank + 1) ** 1.07 for rank in range(len(vocab))))
+    pages = []
+    for i in range(n_pages):
+        body = rng.choices(vocab, cum_weights=weights, k=n_words)
+        pages.append({
+            "_id": f"p{i}", "title": " ".join(body[:3]).title(),
+            "group": rng.choice(["Codex of Rules", "Bestiary", "Lore", "Places"]),
+            "subcategory": rng.choice(["Combat", "Magic", "History", "Cities", "Beasts"]),
+            "content": " ".join(body),
+        })
+    return pages, weights
+
+def percentile(samples: list, pct: float):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+def run(index, queries: list):
+    timings = []
+    for q in queries:
+        started = time.perf_counter()
+        index.search(q)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20000)
+    parser.add_argument("--words", type=int, default=200)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocab = make_vocabulary(args.vocabulary, rng)
+    pages, weights = make_pages(args.pages, args.words, vocab, rng)
+
+    started = time.perf_counter()
+    index = build_search_index(pages)
+    print(f"build: {time.perf_counter() - started:.2f} s for {args.pages} pages x {args.words} words ({len(index.postings)} terms)")
+
+    # Queries follow the same Zipf law as the text: mostly common words, some rare
+    words = [rng.choices(vocab, cum_weights=weights, k=rng.randint(1, 3)) for _ in range(args.queries)]
+    suites = {
+        "zipf words": [" ".join(w) for w in words],
+        "2-char prefix": [w[0][:2] for w in words],
+        "3-char prefix": [w[0][:3] for w in words],
+        "words + prefix": [" ".join(w[:-1] + [w[-1][:3]]) for w in words],
+    }
+    for name, queries in suites.items():
+        run(index, queries[:50])  # warm up
+        timings = run(index, queries)
+        print(f"{name:>15}: p50 {statistics.median(timings):6.2f} ms  p95 {percentile(timings, 0.95):6.2f} ms  max {max(timings):6.2f} ms")
+
+if __name__ == "__main__":
+    main()
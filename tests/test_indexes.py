@@ -0,0 +1,43 @@
+import asyncio
+import os
+
+import pytest
+
+# app.config needs these; the test talks to its own throwaway database
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("DB_NAME", "imperium_test")
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from app.core.indexes import INDEXES, QUERY_SHAPES, ensure_indexes, verify_query_plans
+
+MONGO_URL = os.environ["MONGO_URL"]
+TEST_DB = "imperium_test_query_plans"
+
+def mongod_reachable():
+    try:
+        MongoClient(MONGO_URL, serverSelectionTimeoutMS=500).admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+
+@pytest.mark.skipif(not mongod_reachable(), reason=f"no mongod at {MONGO_URL}")
+def test_every_query_shape_uses_an_index():
+    async def run():
+        client = AsyncIOMotorClient(MONGO_URL)
+        database = client[TEST_DB]
+        try:
+            await ensure_indexes(database)
+            return await verify_query_plans(database)
+        finally:
+            await client.drop_database(TEST_DB)
+            client.close()
+
+    failures = asyncio.run(run())
+    assert not failures, "COLLSCAN in: " + "; ".join(f"{c} find({q}) sort={s}" for c, q, s in failures)
+
+def test_every_queried_collection_declares_indexes():
+    assert {collection for collection, _, _ in QUERY_SHAPES} <= INDEXES.keys()